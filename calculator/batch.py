@@ -0,0 +1,220 @@
+"""Vectorized evaluation of calculator expressions over NumPy arrays.
+
+An expression such as ``x*x + sin(x)`` is compiled once, from the same
+folded AST as ``expression.py``, into a sequence of NumPy ufunc calls.
+Arrays are processed in chunks of ``chunk_size`` elements and every
+intermediate result is written into a scratch buffer of that size, one
+per level of the expression tree, so memory use doesn't grow with the
+input. Trigonometric functions take degrees, as on the calculator's
+buttons.
+
+Where a scalar evaluation would raise (division by zero, square root of
+a negative number, ...) the batch result holds ``inf`` or ``nan``
+instead; ``BatchExpression.evaluate_scalar`` evaluates element by
+element with the scalar engine for checking results.
+"""
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from expression import CalcError, EvaluationError, Node, compile_expression
+
+# Elements per chunk; each scratch buffer is this many float64 values
+CHUNK_SIZE = 65536
+
+ArrayLike = Union[float, np.ndarray]
+ArrayEnv = Mapping[str, ArrayLike]
+# fn(env, buffers) -> result, which may be one of the buffers, an input or a scalar
+ArrayFn = Callable[[ArrayEnv, List[np.ndarray]], ArrayLike]
+
+
+def _degrees(ufunc: np.ufunc) -> Callable[[ArrayLike, np.ndarray], np.ndarray]:
+    def fn(x: ArrayLike, out: np.ndarray) -> np.ndarray:
+        np.radians(x, out=out)
+        return ufunc(out, out=out)
+    return fn
+
+
+# Vector counterparts of expression.FUNCTIONS
+ARRAY_FUNCTIONS: Dict[str, Callable[[ArrayLike, np.ndarray], np.ndarray]] = {
+    'sin': _degrees(np.sin),
+    'cos': _degrees(np.cos),
+    'tan': _degrees(np.tan),
+    'sqrt': lambda x, out: np.sqrt(x, out=out),
+}
+
+# Vector counterparts of expression.CHAIN_OPS; np.remainder has Python's sign rules
+ARRAY_OPS: Dict[str, np.ufunc] = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.true_divide,
+    '%': np.remainder,
+}
+
+
+def _compile_array(node: Node, depth: int = 0) -> Tuple[ArrayFn, int]:
+    """Compile an AST to ufunc calls writing into ``buffers[depth]``
+
+    Returns the function and the number of buffers it needs. Operands of
+    a node at ``depth`` are evaluated at ``depth`` (the first) and
+    ``depth + 1`` (the others), so no operand overwrites a value that is
+    still needed.
+    """
+    kind = node[0]
+    if kind == 'num':
+        try:
+            value = float(node[1])
+        except OverflowError:  # an integer too large for float64
+            value = float('inf') if node[1] > 0 else float('-inf')
+        return (lambda env, buffers: value), depth
+    if kind == 'var':
+        name = node[1]
+        return (lambda env, buffers: env[name]), depth
+    if kind in ('neg', 'pct', 'call'):
+        operand, used = _compile_array(node[-1], depth)
+        if kind == 'neg':
+            def unary(env: ArrayEnv, buffers: List[np.ndarray]) -> ArrayLike:
+                return np.negative(operand(env, buffers), out=buffers[depth])
+        elif kind == 'pct':
+            def unary(env: ArrayEnv, buffers: List[np.ndarray]) -> ArrayLike:
+                return np.true_divide(operand(env, buffers), 100, out=buffers[depth])
+        else:
+            fn = ARRAY_FUNCTIONS[node[1]]
+
+            def unary(env: ArrayEnv, buffers: List[np.ndarray]) -> ArrayLike:
+                return fn(operand(env, buffers), buffers[depth])
+        return unary, max(used, depth + 1)
+    if kind == 'pow':
+        base, used_base = _compile_array(node[1], depth)
+        exponent, used_exponent = _compile_array(node[2], depth + 1)
+
+        def power(env: ArrayEnv, buffers: List[np.ndarray]) -> ArrayLike:
+            return np.power(base(env, buffers), exponent(env, buffers), out=buffers[depth])
+        return power, max(used_base, used_exponent, depth + 1)
+
+    first, used = _compile_array(node[1], depth)
+    steps = []
+    for op, term in node[2]:
+        fn, term_used = _compile_array(term, depth + 1)
+        steps.append((op, fn))
+        used = max(used, term_used)
+
+    def chain(env: ArrayEnv, buffers: List[np.ndarray]) -> ArrayLike:
+        out, scratch = buffers[depth], buffers[depth + 1]
+        total = first(env, buffers)
+        for op, term in steps:
+            value = term(env, buffers)
+            if op == '+%' or op == '-%':
+                # a + a*b/100, in the same order as the scalar engine
+                np.multiply(total, value, out=scratch)
+                np.true_divide(scratch, 100, out=scratch)
+                total = (np.add if op == '+%' else np.subtract)(total, scratch, out=out)
+            else:
+                total = ARRAY_OPS[op](total, value, out=out)
+        return total
+    return chain, max(used, depth + 2)
+
+
+class BatchExpression:
+    """An expression compiled for evaluation over arrays
+
+    Variables may be arrays, which must all have the same shape, or
+    scalars, which are broadcast. Values are computed in float64.
+    """
+    def __init__(self, source: str, chunk_size: int = CHUNK_SIZE):
+        self.expression = compile_expression(source)
+        self.chunk_size = max(chunk_size, 1)
+        self._fn, self._buffers = _compile_array(self.expression.tree)
+
+    @property
+    def source(self) -> str:
+        return self.expression.source
+
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        return self.expression.variables
+
+    def _inputs(self, variables: Mapping[str, ArrayLike]) -> Tuple[Dict[str, ArrayLike], Dict[str, np.ndarray], Tuple[int, ...]]:
+        """Split the variables into scalars and flattened arrays of a common shape"""
+        missing = [name for name in self.variables if name not in variables]
+        if missing:
+            raise EvaluationError(f"Unknown name {missing[0]!r}")
+        scalars: Dict[str, ArrayLike] = {}
+        arrays: Dict[str, np.ndarray] = {}
+        shape: Optional[Tuple[int, ...]] = None
+        for name in self.variables:
+            value = np.asarray(variables[name], dtype=np.float64)
+            if value.ndim == 0:
+                scalars[name] = float(value)
+                continue
+            if shape is None:
+                shape = value.shape
+            elif value.shape != shape:
+                raise ValueError(f"{name!r} has shape {value.shape}, expected {shape}")
+            arrays[name] = value.reshape(-1)
+        return scalars, arrays, shape if shape is not None else ()
+
+    def evaluate(self, variables: Optional[Mapping[str, ArrayLike]] = None,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Evaluate over the given arrays, optionally into ``out``"""
+        scalars, arrays, shape = self._inputs(variables or {})
+        if out is None:
+            out = np.empty(shape, dtype=np.float64)
+        elif out.shape != shape:
+            raise ValueError(f"out has shape {out.shape}, expected {shape}")
+        result = out.reshape(-1)
+        if result.size and not np.shares_memory(result, out):
+            raise ValueError("out must be contiguous")
+
+        size = result.size
+        if size == 0:
+            return out
+        chunk = min(self.chunk_size, size)
+        scratch = [np.empty(chunk, dtype=np.float64) for _ in range(self._buffers)]
+        # The top level can write straight into the result unless it overlaps an input
+        direct = not any(np.may_share_memory(result, array) for array in arrays.values())
+        env = dict(scalars)
+        with np.errstate(all='ignore'):
+            for start in range(0, size, chunk):
+                stop = min(start + chunk, size)
+                for name, array in arrays.items():
+                    env[name] = array[start:stop]
+                buffers = [buffer[:stop - start] for buffer in scratch]
+                target = result[start:stop]
+                if direct and buffers:
+                    buffers[0] = target
+                value = self._fn(env, buffers)
+                if value is not target:
+                    np.copyto(target, value)
+        return out
+
+    def __call__(self, **variables: ArrayLike) -> np.ndarray:
+        return self.evaluate(variables)
+
+    def evaluate_scalar(self, variables: Optional[Mapping[str, ArrayLike]] = None) -> np.ndarray:
+        """Element-by-element evaluation with the scalar engine, ``nan`` where it raises
+
+        Much slower than ``evaluate``; meant for checking its results.
+        """
+        scalars, arrays, shape = self._inputs(variables or {})
+        size = int(np.prod(shape))
+        result = np.empty(size, dtype=np.float64)
+        env = dict(scalars)
+        for i in range(size):
+            for name, array in arrays.items():
+                env[name] = float(array[i])
+            try:
+                result[i] = self.expression.evaluate(env)
+            except CalcError:
+                result[i] = np.nan
+        return result.reshape(shape)
+
+    def __repr__(self) -> str:
+        return f"BatchExpression({self.source!r})"
+
+
+def evaluate_batch(text: str, variables: Optional[Mapping[str, ArrayLike]] = None,
+                   chunk_size: int = CHUNK_SIZE, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Evaluate ``text`` over arrays of variable values; see BatchExpression"""
+    return BatchExpression(text, chunk_size).evaluate(variables, out)
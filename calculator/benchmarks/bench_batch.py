@@ -0,0 +1,82 @@
+"""Compare vectorized batch evaluation against per-value eval and the scalar engine.
+
+Usage:
+    python benchmarks/bench_batch.py [--sizes 10000 1000000] [--expression "x*x + sin(x)"]
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from batch import CHUNK_SIZE, BatchExpression
+
+# Per-value loops are only timed up to this many values and extrapolated beyond
+MAX_LOOP_SIZE = 200_000
+
+# Namespace giving eval the calculator's degree-based functions
+EVAL_NAMES = {
+    'sin': lambda x: math.sin(math.radians(x)),
+    'cos': lambda x: math.cos(math.radians(x)),
+    'tan': lambda x: math.tan(math.radians(x)),
+    'sqrt': math.sqrt,
+}
+
+
+def per_value_eval(text: str, values: np.ndarray) -> np.ndarray:
+    code = compile(text, "<expression>", "eval")
+    names = dict(EVAL_NAMES)
+    result = np.empty(len(values))
+    for i, x in enumerate(values.tolist()):
+        names['x'] = x
+        result[i] = eval(code, names)
+    return result
+
+
+def bench(text: str, size: int, chunk_size: int, repeat: int) -> None:
+    values = np.linspace(-1000.0, 1000.0, size)
+    batch = BatchExpression(text, chunk_size)
+
+    vector_time = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = batch.evaluate({'x': values})
+        vector_time = min(vector_time, time.perf_counter() - start)
+
+    sample = values[:min(size, MAX_LOOP_SIZE)]
+    start = time.perf_counter()
+    expected = per_value_eval(text, sample)
+    eval_time = (time.perf_counter() - start) * size / len(sample)
+    start = time.perf_counter()
+    scalar = batch.evaluate_scalar({'x': sample})
+    scalar_time = (time.perf_counter() - start) * size / len(sample)
+
+    if not np.allclose(result[:len(sample)], expected, rtol=1e-12, atol=0, equal_nan=True):
+        raise AssertionError(f"Batch result disagrees with eval for {text!r}")
+    if not np.allclose(scalar, expected, rtol=0, atol=0, equal_nan=True):
+        raise AssertionError(f"Scalar fallback disagrees with eval for {text!r}")
+
+    estimated = "~" if len(sample) < size else " "
+    print(f"{size:>9} values | eval loop {estimated}{eval_time * 1000:9.1f} ms | "
+          f"scalar engine {estimated}{scalar_time * 1000:9.1f} ms | "
+          f"vectorized {vector_time * 1000:8.2f} ms | speedup {eval_time / max(vector_time, 1e-9):6.0f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vectorized batch evaluation benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--expression", default="x*x + sin(x)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Expression: {args.expression}")
+    for size in args.sizes:
+        bench(args.expression, size, args.chunk_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
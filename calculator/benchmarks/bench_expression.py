@@ -0,0 +1,104 @@
+"""Compare the compiled expression engine against eval on random expressions.
+
+Usage:
+    python benchmarks/bench_expression.py [--counts 1000 10000] [--terms 8] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from expression import CalcError, Expression, compile_expression, evaluate
+
+
+def random_expression(rng: random.Random, terms: int) -> str:
+    """Random + - * / expression with parentheses, valid for both eval and the engine"""
+    def operand(depth: int) -> str:
+        if depth < 2 and rng.random() < 0.2:
+            return "(" + chain(rng.randint(2, 4), depth + 1) + ")"
+        if rng.random() < 0.5:
+            return str(rng.randint(0, 999))
+        return f"{rng.uniform(0, 100):.2f}"
+
+    def chain(count: int, depth: int) -> str:
+        parts = [operand(depth)]
+        for _ in range(count - 1):
+            parts.append(rng.choice("+-*/"))
+            parts.append(operand(depth))
+        return "".join(parts)
+
+    return chain(terms, 0)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench(count: int, terms: int, repeat: int, seed: int) -> None:
+    rng = random.Random(seed)
+    corpus = [random_expression(rng, rng.randint(1, terms)) for _ in range(count)]
+
+    expected = {}
+    for text in corpus:
+        try:
+            expected[text] = eval(text)
+        except ZeroDivisionError:
+            pass
+    for text, value in expected.items():
+        got = evaluate(text)
+        if got != value:
+            raise AssertionError(f"{text!r}: engine gave {got!r}, eval gave {value!r}")
+
+    def run_eval():
+        for text in corpus:
+            try:
+                eval(text)
+            except ZeroDivisionError:
+                pass
+
+    def run_engine():
+        for text in corpus:
+            try:
+                evaluate(text)
+            except CalcError:
+                pass
+
+    def run_parse():
+        for text in corpus:
+            try:
+                Expression(text)
+            except CalcError:
+                pass
+
+    eval_time = min(timed(run_eval) for _ in range(repeat))
+    parse_time = min(timed(run_parse) for _ in range(repeat))
+    compile_expression.cache_clear()
+    cold_time = timed(run_engine)
+    warm_time = min(timed(run_engine) for _ in range(repeat))
+
+    per = 1e6 / count
+    print(f"{count:>7} expressions | eval {eval_time * per:7.2f} us | "
+          f"parse+compile {parse_time * per:7.2f} us | "
+          f"cold cache {cold_time * per:7.2f} us | warm cache {warm_time * per:7.2f} us | "
+          f"speedup {eval_time / max(warm_time, 1e-9):5.1f}x warm")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Expression engine vs eval benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--terms", type=int, default=8, help="maximum operands per expression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    for count in args.counts:
+        bench(count, args.terms, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
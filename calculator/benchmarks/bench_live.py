@@ -0,0 +1,76 @@
+"""Time the live preview per keystroke against re-evaluating the whole expression.
+
+Usage:
+    python benchmarks/bench_live.py [--lengths 100 1000 10000] [--keys 500]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from expression import CalcError, evaluate, format_number
+from live import LiveExpression
+
+
+def random_keys(rng: random.Random, length: int) -> str:
+    """Keystrokes as the buttons produce them: numbers, operators and the odd percent sign"""
+    keys = []
+    while len(keys) < length:
+        keys.extend(str(rng.randint(1, 999)))
+        if rng.random() < 0.1:
+            keys.append("%")
+        keys.append(rng.choice("+-*/"))
+    return "".join(keys[:length])
+
+
+def full_preview(text: str) -> str:
+    try:
+        return format_number(evaluate(text.rstrip("+-*/")))
+    except CalcError:
+        return ""
+
+
+def bench(length: int, keys: int, rng: random.Random) -> None:
+    text = random_keys(rng, length + keys)
+    prefix, typed = text[:length], text[length:]
+
+    live = LiveExpression(prefix)
+    start = time.perf_counter()
+    for key in typed:
+        live.append(key)
+        live.preview()
+    live_time = (time.perf_counter() - start) / keys
+
+    start = time.perf_counter()
+    for i in range(1, keys + 1):
+        full_preview(prefix + typed[:i])
+    full_time = (time.perf_counter() - start) / keys
+
+    start = time.perf_counter()
+    for _ in range(keys):
+        live.backspace()
+        live.preview()
+    backspace_time = (time.perf_counter() - start) / keys
+
+    print(f"{length:>8} chars | live {live_time * 1e6:7.1f} us/key | "
+          f"backspace {backspace_time * 1e6:7.1f} us/key | "
+          f"full re-parse {full_time * 1e6:9.1f} us/key ({full_time / live_time:,.0f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Live preview keystroke benchmark")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--keys", type=int, default=500, help="keystrokes timed at each length")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for length in args.lengths:
+        bench(length, args.keys, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Time high-precision evaluation of a calculation history, cold and memoized.
+
+Usage:
+    python benchmarks/bench_precision.py [--digits 50 500 2000] [--entries 500]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from precision import MODES, PreciseEvaluator
+
+
+def make_history(rng: random.Random, entries: int, parts: int) -> list:
+    """History whose entries reuse a pool of scientific sub-expressions, as real ones tend to"""
+    pool = [f"sin({rng.randint(1, 359)})*sqrt({rng.randint(2, 999)})/({rng.randint(1, 99)}+1/3)"
+            for _ in range(parts)]
+    return [" + ".join(rng.sample(pool, rng.randint(2, 8))) for _ in range(entries)]
+
+
+def bench(mode: str, digits: int, history: list) -> None:
+    # A memo too small to hold anything measures evaluation without memoization
+    uncached = PreciseEvaluator(mode, digits, memo_size=0, history_size=0)
+    start = time.perf_counter()
+    expected = [uncached.evaluate(entry) for entry in history]
+    uncached_time = time.perf_counter() - start
+
+    evaluator = PreciseEvaluator(mode, digits)
+    start = time.perf_counter()
+    first = [evaluator.evaluate(entry) for entry in history]
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    replay = [evaluator.evaluate(entry) for entry in history]
+    replay_time = time.perf_counter() - start
+
+    if first != expected or replay != expected:
+        raise AssertionError(f"Memoized results differ at {digits} digits in {mode} mode")
+    print(f"{mode:>8} {digits:>6} digits | no memo {uncached_time * 1000:9.1f} ms | "
+          f"first pass {first_time * 1000:8.1f} ms ({evaluator.hits} sub-expression hits) | "
+          f"replay {replay_time * 1000:6.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precision mode history benchmark")
+    parser.add_argument("--digits", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--parts", type=int, default=40, help="distinct sub-expressions in the history")
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=list(MODES))
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    history = make_history(random.Random(args.seed), args.entries, args.parts)
+    for mode in args.mode:
+        for digits in args.digits:
+            bench(mode, digits, history)
+
+
+if __name__ == "__main__":
+    main()
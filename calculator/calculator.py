@@ -1,9 +1,17 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk
-import math
+from expression import CalcError, evaluate, format_number
+from live import LiveExpression
+from precision import DEFAULT_DIGITS, get_evaluator
+
+# Quiet time after a keypress before the live preview is redrawn
+PREVIEW_DELAY_MS = 120
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, precision=None):
+        # None for floating point, or a PreciseEvaluator for decimal/exact results
+        self.precision = precision
         self.window = tk.Tk()
         self.window.geometry("375x667")
         self.window.resizable(False, False)
@@ -27,9 +35,20 @@ class Calculator:
                                justify="right",
                                style="Display.TEntry")
         self.display.grid(row=0, column=0, sticky="nsew")
+
+        # Live preview of the result while typing
+        self.preview = tk.StringVar()
+        self.preview_label = ttk.Label(self.display_frame,
+                                       textvariable=self.preview,
+                                       anchor="e",
+                                       font=("Arial", 16),
+                                       foreground="gray")
+        self.preview_label.grid(row=1, column=0, sticky="nsew")
         
         # Initialize variables
         self.current_expression = ""
+        self.live = LiveExpression()
+        self.preview_job = None
         self.last_was_operator = False
         self.last_was_equals = False
         
@@ -117,33 +136,66 @@ class Calculator:
     def add_to_expression(self, value):
         if self.last_was_equals:
             self.current_expression = ""
+            self.live.clear()
             self.last_was_equals = False
             
         if value in "+-*/%":
             if self.last_was_operator:
                 self.current_expression = self.current_expression[:-1]
+                self.live.backspace()
             self.last_was_operator = True
         else:
             self.last_was_operator = False
             
         self.current_expression += value
+        self.live.append(value)
         self.equation.set(self.current_expression)
+        self.schedule_preview()
         
+    def evaluate(self, expression):
+        if self.precision is not None:
+            return self.precision.format(self.precision.evaluate(expression))
+        return format_number(evaluate(expression))
+
+    def schedule_preview(self):
+        # Debounced, so a burst of keypresses redraws the preview once
+        if self.preview_job is not None:
+            self.window.after_cancel(self.preview_job)
+        self.preview_job = self.window.after(PREVIEW_DELAY_MS, self.update_preview)
+
+    def update_preview(self):
+        self.preview_job = None
+        text = ""
+        if self.last_was_equals:
+            pass
+        elif self.precision is not None:
+            try:
+                text = self.evaluate(self.current_expression)
+            except CalcError:
+                pass
+        else:
+            text = self.live.preview()
+        self.preview.set("" if text == self.current_expression else text)
+
     def calculate(self):
         try:
-            result = eval(self.current_expression)
-            self.current_expression = str(result)
+            self.current_expression = self.evaluate(self.current_expression)
+            self.live.reset(self.current_expression)
             self.equation.set(self.current_expression)
             self.last_was_equals = True
-        except:
+        except CalcError:
             self.equation.set("Error")
             self.current_expression = ""
+            self.live.clear()
+        self.schedule_preview()
             
     def clear(self):
         self.current_expression = ""
+        self.live.clear()
         self.equation.set("")
         self.last_was_operator = False
         self.last_was_equals = False
+        self.schedule_preview()
         
     def toggle_sign(self):
         try:
@@ -152,36 +204,48 @@ class Calculator:
                     self.current_expression = self.current_expression[1:]
                 else:
                     self.current_expression = "-" + self.current_expression
+                self.live.toggle_sign()
                 self.equation.set(self.current_expression)
+                self.schedule_preview()
         except:
             pass
             
     def backspace(self):
         self.current_expression = self.current_expression[:-1]
+        self.live.backspace()
         self.equation.set(self.current_expression)
+        self.schedule_preview()
         
     def scientific_operation(self, operation):
         try:
-            num = float(self.current_expression)
-            if operation == "sin":
-                result = math.sin(math.radians(num))
-            elif operation == "cos":
-                result = math.cos(math.radians(num))
-            elif operation == "tan":
-                result = math.tan(math.radians(num))
-            elif operation == "sqrt":
-                result = math.sqrt(num)
-                
-            self.current_expression = str(result)
+            self.current_expression = self.evaluate(f"{operation}({self.current_expression})")
+            self.live.reset(self.current_expression)
             self.equation.set(self.current_expression)
             self.last_was_equals = True
-        except:
+        except CalcError:
             self.equation.set("Error")
             self.current_expression = ""
+            self.live.clear()
+        self.schedule_preview()
             
     def run(self):
         self.window.mainloop()
 
 if __name__ == "__main__":
-    calc = Calculator()
+    parser = argparse.ArgumentParser(description="Calculator")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--decimal", type=int, metavar="DIGITS",
+                      help="calculate in decimal with this many significant digits")
+    mode.add_argument("--exact", action="store_true",
+                      help="calculate with exact fractions")
+    args = parser.parse_args()
+
+    precision = None
+    if args.decimal is not None:
+        if args.decimal < 1:
+            parser.error("--decimal needs at least 1 digit")
+        precision = get_evaluator("decimal", args.decimal)
+    elif args.exact:
+        precision = get_evaluator("fraction", DEFAULT_DIGITS)
+    calc = Calculator(precision)
     calc.run() 
\ No newline at end of file
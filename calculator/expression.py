@@ -0,0 +1,387 @@
+"""Calculator expression engine: tokenizer, Pratt parser and closure compiler.
+
+Expressions use the calculator's operators: ``+ - * / %``, unary minus,
+parentheses, ``**`` and the functions ``sin cos tan`` (in degrees) and
+``sqrt``. ``%`` between two operands is the remainder, as before; at the
+end of an operand it is a percentage, so ``50%`` is 0.5 and ``200+10%``
+is 220. Nothing here depends on tkinter.
+"""
+import re
+import math
+import operator
+from functools import lru_cache
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+Number = Union[int, float]
+Node = tuple
+
+CACHE_SIZE = 1024
+# Integer powers above this exponent, or whose result would have more bits
+# than this (about 4200 digits, within what str() converts), are computed
+# in floating point
+MAX_INT_EXPONENT = 1000
+MAX_INT_BITS = 14000
+
+
+class CalcError(ValueError):
+    """Base class for expression errors"""
+
+
+class ParseError(CalcError):
+    """The expression is not well formed"""
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+class EvaluationError(CalcError):
+    """The expression is well formed but has no value (e.g. division by zero)"""
+
+
+# Tokens
+
+class Token(NamedTuple):
+    kind: str  # 'num', 'name', 'op' or 'end'
+    text: str
+    position: int
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>\*\*|[-+*/%()×÷])
+  | (?P<root>√)
+  | (?P<space>\s+)
+  | (?P<error>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Display symbols accepted as aliases of the ASCII operators
+_ALIASES = {'×': '*', '÷': '/'}
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens = []
+    append = tokens.append
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'op':
+            value = match.group()
+            append(Token(kind, _ALIASES.get(value, value), match.start()))
+        elif kind == 'num' or kind == 'name':
+            append(Token(kind, match.group(), match.start()))
+        elif kind == 'root':
+            append(Token('name', 'sqrt', match.start()))
+        elif kind == 'error':
+            raise ParseError(f"Unexpected character {match.group()!r}", match.start())
+    append(Token('end', '', len(text)))
+    return tokens
+
+
+# Parser
+
+def _degrees(fn: Callable[[float], float]) -> Callable[[Number], float]:
+    return lambda x: fn(math.radians(x))
+
+
+# Functions of the scientific buttons, with trigonometry in degrees
+FUNCTIONS: Dict[str, Callable[[Number], float]] = {
+    'sin': _degrees(math.sin),
+    'cos': _degrees(math.cos),
+    'tan': _degrees(math.tan),
+    'sqrt': math.sqrt,
+}
+
+def parse_number(text: str) -> Number:
+    return float(text) if any(c in text for c in '.eE') else int(text)
+
+
+# Left binding powers of the infix operators
+_BINARY = {'+': 10, '-': 10, '*': 20, '/': 20, '%': 20, '**': 40}
+_UNARY = 30
+_POSTFIX = 50
+_STARTS_OPERAND = ('num', 'name')
+
+
+class Parser:
+    """Pratt parser producing a tuple AST
+
+    Runs of operators with the same precedence become one flat node, so
+    long sums and products don't make deep trees:
+    ``('sum', first, ((op, node), ...))`` with ops ``+ - +% -%`` (the
+    last two for ``a + b%`` and ``a - b%``) and ``('product', first,
+    ((op, node), ...))`` with ops ``* / %``. The other nodes are
+    ``('num', value)``, ``('var', name)``, ``('neg', x)``, ``('pct', x)``,
+    ``('pow', base, exponent)`` and ``('call', name, x)``.
+    """
+    def __init__(self, text: str, number: Optional[Callable[[str], object]] = None):
+        self.tokens = tokenize(text)
+        self.index = 0
+        self.number = number or parse_number
+
+    def peek(self) -> Token:
+        return self.tokens[self.index]
+
+    def advance(self) -> Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        token = self.advance()
+        if token.text != text:
+            raise ParseError(f"Expected {text!r}", token.position)
+
+    def parse(self) -> Node:
+        if self.peek().kind == 'end':
+            raise ParseError("Empty expression", 0)
+        try:
+            node = self.expression(0)
+        except RecursionError:
+            raise ParseError("Expression is nested too deeply", self.peek().position) from None
+        token = self.peek()
+        if token.kind != 'end':
+            raise ParseError(f"Unexpected {token.text!r}", token.position)
+        return node
+
+    def expression(self, min_bp: int) -> Node:
+        left = self.prefix(self.advance())
+        while True:
+            token = self.peek()
+            if token.kind != 'op' or token.text not in _BINARY:
+                break
+            if token.text == '%' and not self.starts_operand(self.tokens[self.index + 1]):
+                # Postfix percentage binds tighter than any infix operator
+                if _POSTFIX <= min_bp:
+                    break
+                self.advance()
+                left = ('pct', left)
+                continue
+            bp = _BINARY[token.text]
+            if bp <= min_bp:
+                break
+            self.advance()
+            if token.text == '**':
+                # Right associative, and binds tighter than a unary minus on its left
+                left = ('pow', left, self.expression(bp - 1))
+                continue
+            op, right = token.text, self.expression(bp)
+            if op in '+-' and right[0] == 'pct':
+                op, right = op + '%', right[1]
+            kind = 'sum' if bp == _BINARY['+'] else 'product'
+            if left[0] == kind:
+                left[2].append((op, right))  # still being built, so the list is ours
+            else:
+                left = (kind, left, [(op, right)])
+        return left
+
+    @staticmethod
+    def starts_operand(token: Token) -> bool:
+        return token.kind in _STARTS_OPERAND or token.text == '('
+
+    def prefix(self, token: Token) -> Node:
+        if token.kind == 'num':
+            return ('num', self.number(token.text))
+        if token.kind == 'name':
+            if token.text in FUNCTIONS:
+                self.expect('(')
+                arg = self.expression(0)
+                self.expect(')')
+                return ('call', token.text, arg)
+            return ('var', token.text)
+        if token.text == '(':
+            node = self.expression(0)
+            self.expect(')')
+            return node
+        if token.text in '+-' and token.kind == 'op':
+            operand = self.expression(_UNARY)
+            return ('neg', operand) if token.text == '-' else operand
+        if token.kind == 'end':
+            raise ParseError("Unexpected end of expression", token.position)
+        raise ParseError(f"Unexpected {token.text!r}", token.position)
+
+
+def parse(text: str, number: Optional[Callable[[str], object]] = None) -> Node:
+    """Parse ``text``; ``number`` converts numeric literals (default: int or float)"""
+    return Parser(text, number).parse()
+
+
+# Evaluation
+
+def _power(a: Number, b: Number) -> Number:
+    if isinstance(a, int) and isinstance(b, int) and (
+            abs(b) > MAX_INT_EXPONENT or (b > 0 and a.bit_length() * b > MAX_INT_BITS)):
+        return float(a) ** b
+    result = a ** b
+    if isinstance(result, complex):
+        raise EvaluationError("Fractional power of a negative number")
+    return result
+
+
+# Operators of sum and product chains; ``a + b%`` adds b percent of a
+CHAIN_OPS: Dict[str, Callable[[Number, Number], Number]] = {
+    '+': operator.add,
+    '-': operator.sub,
+    '+%': lambda a, b: a + a * b / 100,
+    '-%': lambda a, b: a - a * b / 100,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+}
+
+
+def _percent(x: Number) -> float:
+    return x / 100
+
+
+Env = Mapping[str, Number]
+Compiled = Callable[[Env], Number]
+
+
+def _guarded(fn: Compiled) -> Compiled:
+    """Wrap a compiled node so arithmetic failures raise EvaluationError"""
+    def guarded(env: Env) -> Number:
+        try:
+            return fn(env)
+        except ZeroDivisionError:
+            raise EvaluationError("Division by zero") from None
+        except OverflowError:
+            raise EvaluationError("Result too large") from None
+        except ValueError as e:
+            if isinstance(e, CalcError):
+                raise
+            raise EvaluationError(str(e)) from None
+    return guarded
+
+
+def fold(node: Node) -> Node:
+    """Replace constant subtrees, and the constant start of chains, with their values
+
+    Only leading terms of a chain are combined, so the left-to-right order
+    of floating point operations is unchanged. Subtrees whose evaluation
+    fails are kept, so the error is raised when the expression is
+    evaluated rather than when it is compiled.
+    """
+    kind = node[0]
+    if kind in ('num', 'var'):
+        return node
+    if kind in ('sum', 'product'):
+        first = fold(node[1])
+        items = [(op, fold(term)) for op, term in node[2]]
+        done = 0
+        while done < len(items) and first[0] == 'num' and items[done][1][0] == 'num':
+            try:
+                first = ('num', _compile((kind, first, items[done:done + 1]))({}))
+            except CalcError:
+                break
+            done += 1
+        return (kind, first, tuple(items[done:])) if done < len(items) else first
+    children = tuple(fold(child) if isinstance(child, tuple) else child for child in node[1:])
+    node = (kind,) + children
+    if all(child[0] == 'num' for child in children if isinstance(child, tuple)):
+        try:
+            return ('num', _compile(node)({}))
+        except CalcError:
+            return node
+    return node
+
+
+def _compile_node(node: Node) -> Compiled:
+    kind = node[0]
+    if kind == 'num':
+        value = node[1]
+        return lambda env: value
+    if kind == 'var':
+        name = node[1]
+
+        def variable(env: Env) -> Number:
+            try:
+                return env[name]
+            except KeyError:
+                raise EvaluationError(f"Unknown name {name!r}") from None
+        return variable
+    if kind == 'neg':
+        operand = _compile_node(node[1])
+        return lambda env: -operand(env)
+    if kind == 'pct':
+        operand = _compile_node(node[1])
+        return lambda env: _percent(operand(env))
+    if kind == 'call':
+        fn, arg = FUNCTIONS[node[1]], _compile_node(node[2])
+        return lambda env: fn(arg(env))
+    if kind == 'pow':
+        base, exponent = _compile_node(node[1]), _compile_node(node[2])
+        return lambda env: _power(base(env), exponent(env))
+    first = _compile_node(node[1])
+    steps = tuple((CHAIN_OPS[op], _compile_node(term)) for op, term in node[2])
+
+    def chain(env: Env) -> Number:
+        total = first(env)
+        for op, term in steps:
+            total = op(total, term(env))
+        return total
+    return chain
+
+
+def _compile(node: Node) -> Compiled:
+    """Turn an AST into a tree of closures taking the variable bindings"""
+    return _guarded(_compile_node(node))
+
+
+def free_variables(node: Node) -> Tuple[str, ...]:
+    """Names used in an expression, in order of first appearance"""
+    names: Dict[str, None] = {}
+
+    def walk(n: tuple) -> None:
+        if n[0] == 'var':
+            names[n[1]] = None
+            return
+        for child in n:  # also walks the (op, term) pairs of chains
+            if isinstance(child, (tuple, list)):
+                walk(child)
+    walk(node)
+    return tuple(names)
+
+
+class Expression:
+    """A parsed, constant-folded and compiled expression"""
+    __slots__ = ('source', 'tree', 'variables', '_fn')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tree = fold(parse(source))
+        self.variables = free_variables(self.tree)
+        self._fn = _compile(self.tree)
+
+    @property
+    def constant(self) -> Optional[Number]:
+        """The value of an expression that folded to a constant, else None"""
+        return self.tree[1] if self.tree[0] == 'num' else None
+
+    def __call__(self, **variables: Number) -> Number:
+        return self._fn(variables)
+
+    def evaluate(self, variables: Optional[Env] = None) -> Number:
+        return self._fn(variables or {})
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text: str) -> Expression:
+    """Compile an expression, reusing the result for text seen recently"""
+    return Expression(text)
+
+
+def evaluate(text: str, variables: Optional[Env] = None) -> Number:
+    """Evaluate an expression; raises CalcError if it is malformed or has no value"""
+    return compile_expression(text).evaluate(variables)
+
+
+def format_number(value: Number) -> str:
+    """Display form of a result, matching what the calculator has always shown"""
+    try:
+        return str(value)
+    except ValueError:  # an integer with more digits than str() will convert
+        raise EvaluationError("Result too large") from None
+
@@ -0,0 +1,273 @@
+"""Incremental evaluation of the calculator's expression while it is typed.
+
+``LiveExpression`` keeps the expression being edited together with the
+state of an operator-precedence parser after every character. Typing a
+character derives one new state from the previous one, evaluating any
+operators it completes; backspace drops the last state. The preview
+value finishes off a copy of the current state, treating a trailing
+operator as not typed yet and closing open parentheses, so its cost
+depends on how deeply the expression is nested rather than on its
+length.
+
+Results follow ``expression.py`` exactly (the same operators, ``%``
+rules and precedence), so the preview always matches what ``=`` gives.
+"""
+import re
+import operator
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from expression import (CHAIN_OPS, FUNCTIONS, CalcError, Number, _BINARY, _UNARY, _percent, _power,
+                        format_number, parse_number)
+
+# Complete numbers, as in the tokenizer, and text that can still become one
+_NUMBER_RE = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_NUMBER_PREFIX_RE = re.compile(r"\d+\.?\d*(?:[eE][+-]?\d*)?|\.(?:\d+(?:[eE][+-]?\d*)?)?")
+
+_NUMBER_START = '0123456789.'
+
+# Binding powers of the operators waiting on the stack; '(' and function calls are barriers
+_STACK_BP = dict(_BINARY, neg=_UNARY)
+
+# Marks a sub-expression whose evaluation failed, e.g. a division by zero
+_FAILED = object()
+
+# An operand: its value, and its value before a trailing postfix % (else None),
+# which turns ``a + b%`` into a percentage of a
+Operand = Tuple[Any, Any]
+
+
+class _State(NamedTuple):
+    values: Optional[tuple]   # operands as a linked list (operand, rest)
+    ops: Optional[tuple]      # waiting operators as a linked list (op, rest)
+    expecting: bool           # an operand comes next
+    token: str = ''           # number or name being typed
+    percent: bool = False     # a % that is a remainder if an operand follows, else a percentage
+    prev: str = ''            # previous character, so that '*' '*' becomes '**'
+    before: Optional['_State'] = None  # the state before the last binary operator
+    error: bool = False       # the text can't become a valid expression by typing more
+
+
+_START = _State(None, None, True)
+_ERROR = _State(None, None, False, error=True)
+
+
+def _apply(fn, *args) -> Any:
+    if any(arg is _FAILED for arg in args):
+        return _FAILED
+    try:
+        return fn(*args)
+    except (ArithmeticError, ValueError):  # includes CalcError
+        return _FAILED
+
+
+def _reduce(values: tuple, ops: tuple) -> Tuple[tuple, Optional[tuple]]:
+    """Apply the operator on top of the stack"""
+    op, ops = ops
+    if isinstance(op, tuple):  # ('call', name)
+        (x, _), values = values
+        return ((_apply(FUNCTIONS[op[1]], x), None), values), ops
+    if op == 'neg':
+        (x, _), values = values
+        return ((_apply(operator.neg, x), None), values), ops
+    (b, b_before_percent), ((a, _), values) = values
+    if op == '**':
+        value = _apply(_power, a, b)
+    elif op in '+-' and b_before_percent is not None:
+        value = _apply(CHAIN_OPS[op + '%'], a, b_before_percent)
+    else:
+        value = _apply(CHAIN_OPS[op], a, b)
+    return ((value, None), values), ops
+
+
+def _push_operand(state: _State, operand: Operand) -> _State:
+    return state._replace(values=(operand, state.values), expecting=False, token='')
+
+
+def _finish_token(state: _State) -> _State:
+    """End the number or name being typed"""
+    token = state.token
+    if _NUMBER_RE.fullmatch(token):
+        return _push_operand(state, (parse_number(token), None))
+    return _ERROR  # an incomplete number, or a name that isn't followed by '('
+
+
+def _postfix_percent(state: _State) -> _State:
+    (value, _), values = state.values
+    return state._replace(values=((_apply(_percent, value), value), values), percent=False)
+
+
+def _binary(state: _State, op: str) -> _State:
+    bp = _BINARY[op]
+    values, ops = state.values, state.ops
+    while ops is not None:
+        top_bp = _STACK_BP.get(ops[0])
+        if top_bp is None or top_bp < bp or (top_bp == bp and op == '**'):
+            break
+        values, ops = _reduce(values, ops)
+    return state._replace(values=values, ops=(op, ops), expecting=True, percent=False, before=state)
+
+
+def _close(state: _State) -> _State:
+    values, ops = state.values, state.ops
+    while ops is not None and _STACK_BP.get(ops[0]) is not None:
+        values, ops = _reduce(values, ops)
+    if ops is None:
+        return _ERROR
+    if ops[0] != '(':
+        values, ops = _reduce(values, ops)  # function call
+    else:
+        ops = ops[1]
+    return state._replace(values=values, ops=ops)
+
+
+def _starts_name(char: str) -> bool:
+    return (char.isascii() and char.isalpha()) or char in '_√'
+
+
+def _starts_operand(char: str) -> bool:
+    return char in _NUMBER_START or char == '(' or _starts_name(char)
+
+
+def _feed(state: _State, char: str) -> _State:
+    """The state after typing ``char``"""
+    if state.error:
+        return state
+    prev, state = state.prev, state._replace(prev=char)
+    if state.percent and not char.isspace():
+        if _starts_operand(char):
+            state = _binary(state, '%')
+        else:
+            state = _postfix_percent(state)
+    if state.token:
+        token = state.token + char
+        if state.token[0] not in _NUMBER_START and state.token != '√':
+            if char.isalnum() or char == '_':
+                return state._replace(token=token)
+            if char == '(' and state.token in FUNCTIONS:
+                return state._replace(ops=(('call', state.token), state.ops), token='')
+            return _ERROR
+        if state.token == '√':
+            if char == '(':
+                return state._replace(ops=(('call', 'sqrt'), state.ops), token='')
+            return _ERROR
+        if _NUMBER_PREFIX_RE.fullmatch(token):
+            return state._replace(token=token)
+        state = _finish_token(state)
+        if state.error:
+            return state
+
+    if char.isspace():
+        return state
+    if state.expecting:
+        if char == '*' and prev == '*' and state.ops is not None and state.ops[0] == '*':
+            # Undo the '*', whose lower precedence may already have been acted on
+            return _binary(state.before, '**')._replace(prev=char)
+        if char in _NUMBER_START or _starts_name(char):
+            return state._replace(token=char)
+        if char == '(':
+            return state._replace(ops=('(', state.ops))
+        if char == '-':
+            return state._replace(ops=('neg', state.ops))
+        if char == '+':
+            return state
+        return _ERROR
+    if char == '%':
+        return state._replace(percent=True)
+    if char in _BINARY or char in '×÷':
+        return _binary(state, {'×': '*', '÷': '/'}.get(char, char))
+    if char == ')':
+        return _close(state)
+    return _ERROR
+
+
+def _value(state: _State) -> Any:
+    """Value of the expression if typing stopped here; _FAILED or None if it has none"""
+    if state.error:
+        return None
+    if state.token:
+        match = _NUMBER_RE.match(state.token)
+        if match:  # the complete part of a number being typed
+            state = _push_operand(state, (parse_number(match.group()), None))
+    if state.percent:
+        state = _postfix_percent(state)
+    values, ops, expecting = state.values, state.ops, state.expecting
+    while expecting:
+        # Drop trailing operators and open parentheses that have nothing after them
+        if ops is None:
+            return None
+        op, ops = ops
+        expecting = op not in _BINARY
+    while ops is not None:
+        if ops[0] == '(':
+            ops = ops[1]
+        else:
+            values, ops = _reduce(values, ops)
+    return values[0][0]
+
+
+class LiveExpression:
+    """The calculator's expression text, with a preview value kept up to date as it is edited
+
+    A leading minus sign is kept apart from the rest of the text, and the
+    parser states are tracked both with and without it, so toggling the
+    sign is as cheap as typing.
+    """
+    def __init__(self, text: str = ''):
+        self.reset(text)
+
+    def reset(self, text: str) -> None:
+        """Replace the whole expression, e.g. with a result"""
+        self.negated = text.startswith('-')
+        self._chars: List[str] = []
+        self._plain = [_START]
+        self._minus = [_feed(_START, '-')]
+        for char in text[1:] if self.negated else text:
+            self._push(char)
+
+    def clear(self) -> None:
+        self.reset('')
+
+    def _push(self, char: str) -> None:
+        self._chars.append(char)
+        self._plain.append(_feed(self._plain[-1], char))
+        self._minus.append(_feed(self._minus[-1], char))
+
+    @property
+    def text(self) -> str:
+        return ('-' if self.negated else '') + ''.join(self._chars)
+
+    def append(self, text: str) -> None:
+        for char in text:
+            if char == '-' and not self._chars and not self.negated:
+                self.negated = True
+            else:
+                self._push(char)
+
+    def backspace(self) -> None:
+        if self._chars:
+            self._chars.pop()
+            self._plain.pop()
+            self._minus.pop()
+        else:
+            self.negated = False
+
+    def toggle_sign(self) -> None:
+        """Add or remove a leading minus sign"""
+        if not self.negated and self._chars and self._chars[0] == '-':
+            self.reset(self.text[1:])  # a second minus sign has become the leading one
+        elif self._chars or self.negated:
+            self.negated = not self.negated
+
+    def value(self) -> Optional[Number]:
+        """Value of the expression so far, or None if it has none yet"""
+        value = _value((self._minus if self.negated else self._plain)[-1])
+        return None if value is _FAILED else value
+
+    def preview(self) -> str:
+        value = self.value()
+        if value is None:
+            return ''
+        try:
+            return format_number(value)
+        except CalcError:  # e.g. too many digits to display
+            return ''
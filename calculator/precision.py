@@ -0,0 +1,365 @@
+"""Exact and arbitrary-precision evaluation of calculator expressions.
+
+``PreciseEvaluator`` evaluates the same expressions as ``expression.py``
+in one of two modes: ``decimal``, with a configurable number of
+significant digits, or ``fraction``, where ``+ - * / %`` and integer
+powers are exact rationals. Either way ``0.1+0.2`` is exactly 0.3.
+
+sin, cos and tan (in degrees) and sqrt are computed at the requested
+precision: angles are reduced exactly, angles whose sine or cosine is
+rational (0, 30, 90, ... degrees) give exact results and the rest are
+summed as series after halving the angle repeatedly. Square roots of perfect
+squares are exact.
+
+Each evaluator remembers the value of every sub-expression it has
+computed, recognising repeats by structure rather than text, and the
+result of every entry, so re-evaluating a long history at high
+precision mostly looks results up.
+"""
+import decimal
+from collections import OrderedDict
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from math import isqrt
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from expression import EvaluationError, Node, parse
+
+Precise = Union[Decimal, Fraction]
+
+MODES = ('decimal', 'fraction')
+DEFAULT_DIGITS = 50
+# Extra digits carried by intermediate results and series
+GUARD_DIGITS = 10
+# Sub-expressions remembered per evaluator before the memo starts over
+MEMO_SIZE = 65536
+HISTORY_SIZE = 1024
+# Integer powers of fractions above this exponent, or whose numerator or
+# denominator would have more bits than this, are computed in decimal
+MAX_EXACT_EXPONENT = 10000
+MAX_EXACT_BITS = 1 << 20
+
+# Sines of the angles in [0, 90] degrees that are rational (cosines are sines of 90 - angle)
+_EXACT_SINES = {Fraction(0): Fraction(0), Fraction(30): Fraction(1, 2), Fraction(90): Fraction(1)}
+
+
+# Series; these work at the precision of the current decimal context
+
+@lru_cache(maxsize=16)
+def _pi(prec: int) -> Decimal:
+    """pi to ``prec`` significant digits (the series from the decimal module docs)"""
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 2
+        lasts, t, s, n, na, d, da = 0, Decimal(3), 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+        ctx.prec = prec
+        return +s
+
+
+def _sin_cos_series(x: Decimal) -> Tuple[Decimal, Decimal]:
+    """sin and cos of 0 <= x <= pi/4 radians
+
+    The series is summed for 1 - cos of x / 2**k, where it converges
+    quickly and without cancellation, then doubled back up k times with
+    1 - cos 2a = (1 - cos a) * (4 - 2 * (1 - cos a)).
+    """
+    with decimal.localcontext() as ctx:
+        prec = ctx.prec
+        halvings = isqrt(prec) // 2
+        ctx.prec += 5
+        r2 = (x / (1 << halvings)) ** 2
+        term = r2 / 2
+        versine, last, i = term, None, 2
+        while versine != last:
+            last = versine
+            term = -term * r2 / ((i + 1) * (i + 2))
+            versine += term
+            i += 2
+        for _ in range(halvings):
+            versine = versine * (4 - 2 * versine)
+        sin, cos = (versine * (2 - versine)).sqrt(), 1 - versine
+        ctx.prec = prec
+        return +sin, +cos
+
+
+def _to_decimal(value: Precise) -> Decimal:
+    if isinstance(value, Fraction):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+    return value
+
+
+def _turn(angle: Precise) -> Fraction:
+    """An angle in degrees modulo 360, exactly
+
+    Decimals are reduced from their digits and exponent, so a huge angle
+    such as 1e99999999 never has to be written out in full.
+    """
+    if not isinstance(angle, Decimal):
+        return Fraction(angle) % 360
+    if not angle.is_finite():
+        raise EvaluationError("math domain error")
+    sign, digits, exponent = angle.as_tuple()
+    coefficient = int(''.join(map(str, digits)))
+    if exponent >= 0:
+        turn = Fraction(coefficient * pow(10, exponent, 360))
+    else:
+        turn = Fraction(coefficient, 10 ** -exponent)
+    return (-turn if sign else turn) % 360
+
+
+def _sin_cos_degrees(angle: Precise) -> Tuple[Precise, Precise]:
+    """Sine and cosine of an angle in degrees; Fractions where they are exactly rational"""
+    if isinstance(angle, Decimal) and angle and angle.adjusted() < -decimal.getcontext().prec:
+        # So small that sin x = x and cos x = 1 to the working precision;
+        # its exact value could have millions of digits
+        return angle * _pi(decimal.getcontext().prec) / 180, Decimal(1)
+    turn = _turn(angle)
+    quadrant, rest = divmod(turn, 90)
+    sin, cos = _EXACT_SINES.get(rest), _EXACT_SINES.get(90 - rest)
+    if sin is None or cos is None:
+        pi = _pi(decimal.getcontext().prec)
+        if rest > 45:
+            series_cos, series_sin = _sin_cos_series(_to_decimal(90 - rest) * pi / 180)
+        else:
+            series_sin, series_cos = _sin_cos_series(_to_decimal(rest) * pi / 180)
+        sin = series_sin if sin is None else sin
+        cos = series_cos if cos is None else cos
+    # Rotate back by whole quarter turns
+    for _ in range(int(quadrant)):
+        sin, cos = cos, -sin
+    return sin, cos
+
+
+def _sin_degrees(angle: Precise) -> Precise:
+    return _sin_cos_degrees(angle)[0]
+
+
+def _cos_degrees(angle: Precise) -> Precise:
+    return _sin_cos_degrees(angle)[1]
+
+
+def _tan_degrees(angle: Precise) -> Precise:
+    sin, cos = _sin_cos_degrees(angle)
+    if cos == 0:
+        raise EvaluationError("Tangent is undefined at odd multiples of 90 degrees")
+    if isinstance(sin, Fraction) and isinstance(cos, Fraction):
+        return sin / cos
+    return _to_decimal(sin) / _to_decimal(cos)
+
+
+def _sqrt(value: Precise) -> Precise:
+    if value < 0:
+        raise EvaluationError("math domain error")
+    if isinstance(value, Fraction):
+        root_n, root_d = isqrt(value.numerator), isqrt(value.denominator)
+        if root_n * root_n == value.numerator and root_d * root_d == value.denominator:
+            return Fraction(root_n, root_d)
+    return _to_decimal(value).sqrt()
+
+
+PRECISE_FUNCTIONS = {
+    'sin': _sin_degrees,
+    'cos': _cos_degrees,
+    'tan': _tan_degrees,
+    'sqrt': _sqrt,
+}
+
+
+def _power(a: Precise, b: Precise) -> Precise:
+    if a == 0 and b < 0:
+        raise ZeroDivisionError
+    if (isinstance(a, Fraction) and b.denominator == 1 and abs(b) <= MAX_EXACT_EXPONENT
+            and abs(b) * max(a.numerator.bit_length(), a.denominator.bit_length()) <= MAX_EXACT_BITS):
+        return a ** int(b)
+    a, b = _to_decimal(a), _to_decimal(b)
+    if a < 0 and b != b.to_integral_value():
+        raise EvaluationError("Fractional power of a negative number")
+    return a ** b
+
+
+def _mod(a: Precise, b: Precise) -> Precise:
+    """Remainder with the sign of the divisor, like the float engine"""
+    if isinstance(a, Fraction):
+        return a % b
+    remainder = a % b  # Decimal's remainder takes the sign of the dividend
+    if remainder and (remainder < 0) != (b < 0):
+        remainder += b
+    return remainder
+
+
+def _fraction(text: str) -> Fraction:
+    """Exact value of a literal; huge exponents would take far too long to expand"""
+    _, e, exponent = text.lower().partition('e')
+    if e and abs(int(exponent)) > MAX_EXACT_EXPONENT:
+        raise EvaluationError("Exponent too large for exact mode")
+    return Fraction(text)
+
+
+PRECISE_OPS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '+%': lambda a, b: a + a * b / 100,
+    '-%': lambda a, b: a - a * b / 100,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '%': _mod,
+}
+
+
+def format_precise(value: Precise, digits: int = DEFAULT_DIGITS) -> str:
+    """Display form: integers plainly, short fractions as ``n/d``, otherwise decimals to ``digits``"""
+    if isinstance(value, Fraction):
+        try:
+            if value.denominator == 1:
+                return str(value.numerator)
+            if value.denominator < 10 ** digits:
+                return str(value)
+        except ValueError:  # more digits than str() will convert; shown in scientific notation
+            pass
+    with decimal.localcontext() as ctx:
+        ctx.prec = digits
+        value = (+_to_decimal(value)).normalize()
+    if not value:
+        return "0"
+    if -digits < value.adjusted() < digits:
+        return format(value, 'f')
+    return str(value)
+
+
+class PreciseEvaluator:
+    """Evaluates expressions as Decimals with ``digits`` significant digits, or as exact Fractions
+
+    Results are memoized by entry text, and sub-expression values by
+    structure: every distinct sub-expression gets a small integer id from
+    its kind and the ids of its operands, so looking one up costs the
+    same however large it is.
+    """
+    def __init__(self, mode: str = 'decimal', digits: int = DEFAULT_DIGITS,
+                 memo_size: int = MEMO_SIZE, history_size: int = HISTORY_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if digits < 1:
+            raise ValueError("digits must be positive")
+        self.mode = mode
+        self.digits = digits
+        self.memo_size = memo_size
+        self.history_size = history_size
+        self.context = decimal.Context(prec=digits + GUARD_DIGITS)
+        self._literal = Decimal if mode == 'decimal' else _fraction
+        self._ids: Dict[tuple, int] = {}
+        self._values: Dict[int, Precise] = {}
+        self._history: 'OrderedDict[str, Precise]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _coerce(self, value: Precise) -> Precise:
+        if self.mode == 'decimal':
+            return _to_decimal(value)
+        return value if isinstance(value, Fraction) else Fraction(value)
+
+    def _memo(self, key: tuple) -> Tuple[int, Optional[Precise]]:
+        ident = self._ids.get(key)
+        if ident is None:
+            ident = self._ids[key] = len(self._ids)
+            return ident, None
+        return ident, self._values.get(ident)
+
+    def _eval(self, node: Node, env: Mapping[str, Precise]) -> Tuple[int, Precise]:
+        kind = node[0]
+        if kind == 'num':
+            return self._memo(('num', node[1]))[0], node[1]
+        if kind == 'var':
+            try:
+                value = env[node[1]]
+            except KeyError:
+                raise EvaluationError(f"Unknown name {node[1]!r}") from None
+            return self._memo(('var', node[1], value))[0], value
+
+        if kind in ('neg', 'pct'):
+            operand, x = self._eval(node[1], env)
+            key = (kind, operand)
+        elif kind == 'call':
+            operand, x = self._eval(node[2], env)
+            key = (kind, node[1], operand)
+        elif kind == 'pow':
+            base, x = self._eval(node[1], env)
+            exponent, y = self._eval(node[2], env)
+            key = (kind, base, exponent)
+        else:
+            first, x = self._eval(node[1], env)
+            terms = [(op, self._eval(term, env)) for op, term in node[2]]
+            key = (kind, first, tuple((op, ident) for op, (ident, _) in terms))
+
+        ident, value = self._memo(key)
+        if value is not None:
+            self.hits += 1
+            return ident, value
+        self.misses += 1
+        if kind == 'neg':
+            value = -x
+        elif kind == 'pct':
+            value = x / 100
+        elif kind == 'call':
+            value = self._coerce(PRECISE_FUNCTIONS[node[1]](x))
+        elif kind == 'pow':
+            value = self._coerce(_power(x, y))
+        else:
+            value = x
+            for op, (_, y) in terms:
+                value = PRECISE_OPS[op](value, y)
+        self._values[ident] = value
+        return ident, value
+
+    def evaluate(self, text: str, variables: Optional[Mapping[str, object]] = None) -> Precise:
+        """Evaluate ``text``; raises CalcError if it is malformed or has no value
+
+        Variable values are converted from their ``str``, so ``0.1``
+        means exactly one tenth.
+        """
+        if not variables:
+            result = self._history.get(text)
+            if result is not None:
+                self._history.move_to_end(text)
+                return result
+        if len(self._ids) > self.memo_size:
+            self._ids.clear()
+            self._values.clear()
+
+        tree = parse(text, self._literal)
+        env = {name: self._literal(str(value)) for name, value in (variables or {}).items()}
+        try:
+            with decimal.localcontext(self.context) as ctx:
+                result = self._eval(tree, env)[1]
+                if self.mode == 'decimal':
+                    ctx.prec = self.digits
+                    result = +result
+        except ZeroDivisionError:
+            raise EvaluationError("Division by zero") from None
+        except (OverflowError, decimal.Overflow):
+            raise EvaluationError("Result too large") from None
+        except decimal.InvalidOperation:
+            raise EvaluationError("Invalid operation") from None
+
+        if not variables:
+            self._history[text] = result
+            if len(self._history) > self.history_size:
+                self._history.popitem(last=False)
+        return result
+
+    def format(self, value: Precise) -> str:
+        return format_precise(value, self.digits)
+
+    def __repr__(self) -> str:
+        return f"PreciseEvaluator({self.mode!r}, digits={self.digits})"
+
+
+@lru_cache(maxsize=None)
+def get_evaluator(mode: str = 'decimal', digits: int = DEFAULT_DIGITS) -> PreciseEvaluator:
+    """Shared evaluator for a mode and precision, so its memo carries across callers"""
+    return PreciseEvaluator(mode, digits)
@@ -0,0 +1,234 @@
+"""Headless calculator service: newline-delimited expressions in, results out.
+
+Reads expressions from stdin, or from clients of a local Unix socket, and
+writes one line per expression in the same order: the result, or
+``error: <message>`` when it can't be evaluated. Input is taken in
+chunks as it arrives and split into batches; small batches are evaluated
+straight away and large ones on a process pool, so CPU-heavy input is
+spread over every core. Throughput and latency percentiles go to stderr.
+
+Only ``expression.py`` is used, so this runs without tkinter or a display.
+
+Usage:
+    python service.py < expressions.txt > results.txt
+    python service.py --socket /tmp/calculator.sock
+"""
+import os
+import sys
+import stat
+import time
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+from expression import CalcError, evaluate, format_number
+
+READ_SIZE = 65536
+BATCH_SIZE = 256
+# Batches with fewer characters than this are cheaper to evaluate in place than to send to the pool
+POOL_MIN_CHARS = 4096
+# Batches evaluated or waiting to be written, per worker, before reading pauses
+IN_FLIGHT_PER_WORKER = 4
+
+Reader = Callable[[], Awaitable[bytes]]
+
+
+def evaluate_lines(lines: List[str]) -> List[str]:
+    """Result lines for a batch of expressions; runs in the worker processes
+
+    A line that fails in any way gets its own error line, so one bad line
+    never costs the rest of its batch their results.
+    """
+    results = []
+    for line in lines:
+        try:
+            results.append(format_number(evaluate(line)))
+        except CalcError as e:
+            results.append(f"error: {e}")
+        except Exception as e:
+            results.append(f"error: {e!r}")
+    return results
+
+
+class Stats:
+    """Expression count, errors and per-expression latency from read to write"""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latencies = array('d')
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def received(self, when: float) -> None:
+        if self.started is None:
+            self.started = when
+
+    def record(self, received: float, results: List[str]) -> None:
+        now = time.perf_counter()
+        self.count += len(results)
+        self.errors += sum(result.startswith('error: ') for result in results)
+        self.latencies.extend([now - received] * len(results))
+        self.finished = now
+
+    def merge(self, other: 'Stats') -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.latencies.extend(other.latencies)
+        if other.started is not None:
+            self.started = other.started if self.started is None else min(self.started, other.started)
+        if other.finished is not None:
+            self.finished = other.finished if self.finished is None else max(self.finished, other.finished)
+
+    def report(self) -> str:
+        if not self.count:
+            return "0 expressions"
+        elapsed = max(self.finished - self.started, 1e-9)
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            return latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000
+
+        return (f"{self.count} expressions ({self.errors} errors) in {elapsed:.2f} s: "
+                f"{self.count / elapsed:,.0f} expr/s | latency p50 {percentile(50):.2f} ms, "
+                f"p90 {percentile(90):.2f} ms, p99 {percentile(99):.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+
+
+async def serve(read: Reader, write: Callable[[bytes], None], drain: Callable[[], Awaitable[None]],
+                pool: Optional[Executor], stats: Stats, batch_size: int = BATCH_SIZE,
+                max_in_flight: int = IN_FLIGHT_PER_WORKER) -> None:
+    """Evaluate lines from ``read`` until it returns b'', writing results in order"""
+    loop = asyncio.get_running_loop()
+    pending: 'asyncio.Queue[Optional[tuple]]' = asyncio.Queue(max(max_in_flight, 1))
+    failed = False
+
+    def submit(batch: List[str]) -> 'asyncio.Future[List[str]]':
+        if pool is not None and sum(map(len, batch)) >= POOL_MIN_CHARS:
+            return asyncio.wrap_future(pool.submit(evaluate_lines, batch))
+        future = loop.create_future()
+        future.set_result(evaluate_lines(batch))
+        return future
+
+    async def emit() -> None:
+        nonlocal failed
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            received, batch, future = item
+            if failed:
+                future.cancel()
+                continue
+            try:
+                results = await future
+            except Exception as e:  # a worker died; still answer every line
+                results = [f"error: {e!r}"] * len(batch)
+            try:
+                write(''.join(result + '\n' for result in results).encode())
+                await drain()
+            except (ConnectionError, OSError):
+                failed = True  # the other end went away; stop reading
+                continue
+            stats.record(received, results)
+
+    writer = asyncio.create_task(emit())
+    partial = b''
+    try:
+        while not failed:
+            data = await read()
+            received = time.perf_counter()
+            stats.received(received)
+            if not data:
+                break
+            *complete, partial = (partial + data).split(b'\n')
+            lines = [line.decode('utf-8', 'replace').rstrip('\r') for line in complete]
+            for start in range(0, len(lines), batch_size):
+                batch = lines[start:start + batch_size]
+                await pending.put((received, batch, submit(batch)))
+                await asyncio.sleep(0)  # let finished batches be written
+        if partial and not failed:
+            batch = [partial.decode('utf-8', 'replace').rstrip('\r')]
+            await pending.put((time.perf_counter(), batch, submit(batch)))
+    finally:
+        await pending.put(None)
+        await writer
+
+
+async def run_stdin(pool: Optional[Executor], batch_size: int, max_in_flight: int) -> Stats:
+    loop = asyncio.get_running_loop()
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    stats = Stats()
+
+    async def flush() -> None:
+        stdout.flush()
+
+    # read1 on a thread works for pipes, terminals and redirected files alike
+    await serve(lambda: loop.run_in_executor(None, stdin.read1, READ_SIZE),
+                stdout.write, flush, pool, stats, batch_size, max_in_flight)
+    return stats
+
+
+async def run_socket(path: str, pool: Optional[Executor], batch_size: int, max_in_flight: int) -> Stats:
+    total = Stats()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        stats = Stats()
+        try:
+            await serve(lambda: reader.read(READ_SIZE), writer.write, writer.drain,
+                        pool, stats, batch_size, max_in_flight)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            total.merge(stats)
+            print(f"Client done: {stats.report()}", file=sys.stderr)
+
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)  # left over from a previous run
+    server = await asyncio.start_unix_server(handle, path)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Listening on {path}", file=sys.stderr)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        os.unlink(path)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate newline-delimited calculator expressions")
+    parser.add_argument("--socket", metavar="PATH", help="serve clients on a Unix socket instead of stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; 0 evaluates everything in this process")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    batch_size = max(args.batch_size, 1)
+    pool = None
+    if args.workers > 0:
+        # Workers are started on demand; forked ones would inherit open client sockets
+        # and keep them from closing, so start them fresh
+        pool = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn'))
+    max_in_flight = IN_FLIGHT_PER_WORKER * max(args.workers, 1)
+    try:
+        if args.socket:
+            stats = asyncio.run(run_socket(args.socket, pool, batch_size, max_in_flight))
+        else:
+            stats = asyncio.run(run_stdin(pool, batch_size, max_in_flight))
+        print(stats.report(), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+CALCULATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, CALCULATOR)
+
+from expression import CalcError
+from precision import PreciseEvaluator
+
+
+def evaluate_with_timeout(mode, text, timeout=30):
+    """Evaluate in a child process, so a regression fails the test instead of hanging it"""
+    code = ("import sys\n"
+            "from expression import CalcError\n"
+            "from precision import PreciseEvaluator\n"
+            f"ev = PreciseEvaluator({mode!r}, 30)\n"
+            "try:\n"
+            f"    print(ev.format(ev.evaluate({text!r})))\n"
+            "except CalcError as e:\n"
+            "    print('error:', e)\n")
+    result = subprocess.run([sys.executable, "-c", code], cwd=CALCULATOR,
+                            capture_output=True, text=True, timeout=timeout)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.mark.parametrize("mode", ["decimal", "fraction"])
+@pytest.mark.parametrize("text", ["sin(1e99999999)", "cos(1e99999999)", "tan(1e-99999999)",
+                                  "sin(10**5000)"])
+def test_huge_angles_return_quickly(mode, text):
+    assert evaluate_with_timeout(mode, text)
+
+
+def test_huge_angles_are_reduced_exactly():
+    ev = PreciseEvaluator("decimal", 30)
+    # 10**n is 280 modulo 360 for every n >= 3
+    assert ev.evaluate("sin(1e99999999)") == ev.evaluate("sin(280)")
+    assert ev.evaluate("cos(1e999)") == ev.evaluate("cos(280)")
+    assert ev.evaluate("sin(390)") == ev.evaluate("sin(30)")
+
+
+def test_tiny_angles_keep_their_digits():
+    ev = PreciseEvaluator("decimal", 30)
+    assert ev.format(ev.evaluate("sin(1e-40)")) == "1.74532925199432957692369076849E-42"
+    assert ev.format(ev.evaluate("sin(-1e-40)")) == "-1.74532925199432957692369076849E-42"
+    assert ev.evaluate("cos(1e-40)") == 1
+
+
+def test_fraction_mode_rejects_huge_literals():
+    with pytest.raises(CalcError):
+        PreciseEvaluator("fraction").evaluate("1e99999999")
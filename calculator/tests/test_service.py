@@ -0,0 +1,39 @@
+import os
+import sys
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import service
+from service import evaluate_lines
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service.py")
+
+
+def test_errors_are_reported_per_line():
+    results = evaluate_lines(["1+1", "(10**1000)**5", "1/0", "2*3"])
+    assert results[0] == "2"
+    assert results[1].startswith("error: ")
+    assert results[2].startswith("error: ")
+    assert results[3] == "6"
+
+
+def test_unexpected_exception_only_fails_its_line(monkeypatch):
+    def format_number(value):
+        if value == 4:
+            raise RuntimeError("boom")
+        return str(value)
+
+    monkeypatch.setattr(service, "format_number", format_number)
+    assert evaluate_lines(["1+1", "2+2", "3+3"]) == ["2", "error: RuntimeError('boom')", "6"]
+
+
+def test_service_answers_every_line():
+    result = subprocess.run([sys.executable, SERVICE, "--workers", "0"],
+                            input=b"1+1\n(10**1000)**5\n2*3\n",
+                            capture_output=True, timeout=60)
+    assert result.returncode == 0
+    lines = result.stdout.decode().splitlines()
+    assert lines[0] == "2"
+    assert lines[1].startswith("error: ")
+    assert lines[2] == "6"
@@ -0,0 +1,35 @@
+"""Console line input that doesn't block an asyncio event loop."""
+import sys
+import asyncio
+import threading
+from typing import Optional
+
+
+class AsyncConsole:
+    """Reads lines from stdin on a daemon thread and hands them to the event loop
+
+    A thread is used rather than ``loop.add_reader`` so that this also
+    works on Windows, where stdin cannot be watched by the event loop.
+    """
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._lines: 'asyncio.Queue[Optional[str]]' = asyncio.Queue()
+        self._thread = threading.Thread(target=self._read, name='console-input', daemon=True)
+        self._thread.start()
+
+    def _put(self, line: Optional[str]) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._lines.put_nowait, line)
+        except RuntimeError:
+            pass  # the event loop has already closed
+
+    def _read(self) -> None:
+        for line in sys.stdin:
+            self._put(line.rstrip('\r\n'))
+        self._put(None)
+
+    async def readline(self, prompt: str = '') -> Optional[str]:
+        """Show ``prompt`` and wait for the next line; None at end of input"""
+        if prompt:
+            print(prompt, end='', flush=True)
+        return await self._lines.get()
@@ -0,0 +1,187 @@
+"""Persistent, size-bounded cache of downloaded YouTube audio."""
+import os
+import json
+import hashlib
+import time
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'music_player', 'downloads')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# downloader(url, output_dir) -> (file path, title, stream key) or None
+Downloader = Callable[[str, str], Optional[Tuple[str, str, str]]]
+
+
+class CacheEntry(NamedTuple):
+    video_id: str
+    stream: str
+    title: str
+    path: str
+    size: int
+
+
+def video_id_from_url(url: str) -> Optional[str]:
+    """Extract the video ID from the common YouTube URL forms"""
+    parsed = urlparse(url if '//' in url else '//' + url)
+    host = parsed.netloc.lower()
+    if host.endswith('youtu.be'):
+        return parsed.path.strip('/').split('/')[0] or None
+    if 'youtube.com' in host:
+        ids = parse_qs(parsed.query).get('v')
+        if ids:
+            return ids[0]
+        parts = parsed.path.strip('/').split('/')
+        if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+            return parts[1]
+    return None
+
+
+def cache_key(url: str) -> str:
+    """The video ID, or for URLs without one a key derived from the whole URL"""
+    return video_id_from_url(url) or 'url-' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+class DownloadCache:
+    """Downloaded audio stored by video ID and stream, evicted least recently used first
+
+    Files are named ``<video id>-<stream>.<ext>``, where the stream key
+    identifies the chosen stream (for example its itag and bitrate), and an
+    index maps each video ID to its file (URLs without a recognisable ID are
+    keyed by a hash of the URL instead). A hit is answered from the index
+    alone, so callers can skip resolving streams entirely. Downloads go to a
+    temporary directory inside the cache and are renamed into place, so a
+    crash never leaves a partial file that looks complete. Once the total
+    size exceeds ``max_bytes``, the least recently used files are deleted.
+    """
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose file has gone missing
+        return {video_id: entry for video_id, entry in entries.items()
+                if os.path.exists(os.path.join(self.directory, entry['file']))}
+
+    def _save(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _entry(self, video_id: str, entry: dict) -> CacheEntry:
+        return CacheEntry(video_id, entry['stream'], entry['title'],
+                          os.path.join(self.directory, entry['file']), entry['size'])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def get(self, video_id: str) -> Optional[CacheEntry]:
+        """Look up a video, counting the hit or miss and refreshing its recency"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None or not os.path.exists(os.path.join(self.directory, entry['file'])):
+                self._entries.pop(video_id, None)
+                self.misses += 1
+                return None
+            entry['last_access'] = time.time()
+            self.hits += 1
+            self.bytes_saved += entry['size']
+            self._save()
+            return self._entry(video_id, entry)
+
+    def store(self, video_id: str, stream: str, title: str, source_path: str) -> CacheEntry:
+        """Move a downloaded file into the cache and evict old files if needed"""
+        _, ext = os.path.splitext(source_path)
+        file_name = f"{video_id}-{stream}{ext}"
+        final_path = os.path.join(self.directory, file_name)
+        os.replace(source_path, final_path)
+        with self._lock:
+            old = self._entries.get(video_id)
+            if old and old['file'] != file_name:
+                self._remove_file(old['file'])
+            self._entries[video_id] = {
+                'stream': stream,
+                'title': title,
+                'file': file_name,
+                'size': os.path.getsize(final_path),
+                'last_access': time.time(),
+            }
+            self._evict(keep=video_id)
+            self._save()
+            return self._entry(video_id, self._entries[video_id])
+
+    def fetch(self, url: str, downloader: Downloader) -> Optional[CacheEntry]:
+        """Get a video's audio from the cache, downloading it on a miss"""
+        video_id = cache_key(url)
+        entry = self.get(video_id)
+        if entry:
+            return entry
+        work_dir = tempfile.mkdtemp(prefix='.partial-', dir=self.directory)
+        try:
+            result = downloader(url, work_dir)
+            if result is None:
+                return None
+            path, title, stream = result
+            return self.store(video_id, stream, title, path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _remove_file(self, file_name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, file_name))
+        except OSError:
+            pass
+
+    def _evict(self, keep: str) -> None:
+        total = sum(entry['size'] for entry in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1]['last_access'])
+        for video_id, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if video_id == keep:
+                continue
+            self._remove_file(entry['file'])
+            del self._entries[video_id]
+            total -= entry['size']
+
+    def clear(self) -> None:
+        """Delete every cached file"""
+        with self._lock:
+            for entry in self._entries.values():
+                self._remove_file(entry['file'])
+            self._entries.clear()
+            self._save()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for this session and current cache size"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+        }
@@ -0,0 +1,289 @@
+"""Event-driven playback engine with a gapless track queue."""
+import os
+import threading
+from collections import deque
+from typing import IO, Callable, Deque, Optional, Union
+
+import pygame
+
+TRACK_END = pygame.USEREVENT + 1
+COMMAND = pygame.USEREVENT + 2
+
+# A file path, or a readable file object such as a stream still downloading
+Source = Union[str, IO[bytes]]
+
+
+def source_name(source: Source) -> str:
+    """Short display name of a track source"""
+    return os.path.basename(source if isinstance(source, str) else getattr(source, 'name', 'stream'))
+
+
+class PlaybackEngine:
+    """Plays a queue of tracks on a mixer that stays initialized between them
+
+    All pygame calls happen on the engine's own thread, which sleeps in
+    ``pygame.event.wait()`` until something happens. Control methods such
+    as ``enqueue``, ``pause`` or ``skip`` return immediately: they post a
+    command event that wakes the engine thread.
+
+    The next track is always handed to ``pygame.mixer.music.queue`` while
+    the current one plays, so the mixer switches over without a gap. The
+    end-of-track event set up with ``set_endevent`` tells the engine to move
+    on and preload the following track.
+
+    Tracks are file paths or readable file objects; a file object may carry
+    a ``namehint`` attribute (such as ``'mp3'``) to help the decoder.
+
+    ``volume``, if given, maps a track to the mixer volume it should play
+    at (for example a loudness-normalizing gain); it is called on the
+    engine thread as each track starts, so it must not block.
+
+    ``on_idle``, if given, is called on the engine thread whenever the
+    queue runs out or is cleared, just after ``wait`` would return.
+    """
+    def __init__(self, on_track_start: Optional[Callable[[Source], None]] = None,
+                 volume: Optional[Callable[[Source], float]] = None,
+                 on_idle: Optional[Callable[[], None]] = None):
+        self.on_track_start = on_track_start
+        self.on_idle = on_idle
+        self.volume = volume
+        self.current: Optional[Source] = None
+        self.paused = False
+        self._upcoming: Deque[Source] = deque()
+        self._preloaded: Optional[Source] = None
+        self._offset = 0.0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the engine thread and wait for the mixer to come up"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='playback-engine', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    # Control API, safe to call from any thread
+
+    def _post(self, action: str, **kwargs) -> None:
+        self.start()
+        if action == 'enqueue':
+            self._idle.clear()
+        pygame.event.post(pygame.event.Event(COMMAND, action=action, **kwargs))
+
+    def enqueue(self, path: Source) -> None:
+        """Add a track to the end of the queue"""
+        self._post('enqueue', path=path)
+
+    def pause(self) -> None:
+        self._post('pause')
+
+    def resume(self) -> None:
+        self._post('resume')
+
+    def toggle_pause(self) -> None:
+        self._post('toggle_pause')
+
+    def refresh_volume(self) -> None:
+        """Ask ``volume`` again for the current track, e.g. once its gain is known"""
+        self._post('refresh_volume')
+
+    def skip(self) -> None:
+        """Stop the current track and start the next one"""
+        self._post('skip')
+
+    def seek(self, seconds: float) -> None:
+        """Jump to ``seconds`` into the current track"""
+        self._post('seek', seconds=seconds)
+
+    def clear(self) -> None:
+        """Stop playback and drop every queued track"""
+        self._post('clear')
+
+    def shutdown(self) -> None:
+        """Stop playback, quit the mixer and end the engine thread"""
+        if self._thread is None:
+            return
+        self._post('shutdown')
+        self._thread.join()
+        self._thread = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue has finished playing; False on timeout"""
+        return self._idle.wait(timeout)
+
+    @property
+    def queued(self) -> list:
+        """Tracks waiting after the current one"""
+        with self._lock:
+            upcoming = list(self._upcoming)
+        return ([self._preloaded] if self._preloaded is not None else []) + upcoming
+
+    def position(self) -> float:
+        """Seconds played of the current track"""
+        if self.current is None:
+            return 0.0
+        return self._offset + max(pygame.mixer.music.get_pos(), 0) / 1000
+
+    # Engine thread
+
+    def _init_mixer(self) -> None:
+        # The event queue lives in SDL's video subsystem; no window is opened
+        try:
+            pygame.display.init()
+        except pygame.error:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.display.init()
+        pygame.mixer.init()
+        pygame.mixer.music.set_endevent(TRACK_END)
+
+    def _run(self) -> None:
+        try:
+            self._init_mixer()
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                event = pygame.event.wait()
+                if event.type == TRACK_END:
+                    self._advance()
+                elif event.type == COMMAND:
+                    if not self._handle(event):
+                        break
+        finally:
+            pygame.mixer.music.stop()
+            pygame.mixer.quit()
+            self.current = None
+            self._idle.set()
+
+    def _handle(self, event: pygame.event.Event) -> bool:
+        action = event.action
+        if action == 'enqueue':
+            with self._lock:
+                self._upcoming.append(event.path)
+            if self.current is None:
+                self._play_next()
+            elif self._preloaded is None:
+                self._preload()
+        elif action == 'pause' and self.current is not None:
+            pygame.mixer.music.pause()
+            self.paused = True
+        elif action == 'resume' and self.current is not None:
+            pygame.mixer.music.unpause()
+            self.paused = False
+        elif action == 'toggle_pause' and self.current is not None:
+            if self.paused:
+                pygame.mixer.music.unpause()
+            else:
+                pygame.mixer.music.pause()
+            self.paused = not self.paused
+        elif action == 'refresh_volume' and self.current is not None:
+            self._apply_volume(self.current)
+        elif action == 'skip':
+            self._requeue_preloaded()
+            self._play_next()
+        elif action == 'seek' and self.current is not None:
+            # Restarting drops the mixer's queued track, so preload it again
+            self._requeue_preloaded()
+            self._start(self.current, max(event.seconds, 0.0))
+            self._preload()
+        elif action == 'clear':
+            with self._lock:
+                self._upcoming.clear()
+            self._preloaded = None
+            self._halt()
+            self._set_idle()
+        elif action == 'shutdown':
+            return False
+        return True
+
+    def _requeue_preloaded(self) -> None:
+        if self._preloaded is not None:
+            with self._lock:
+                self._upcoming.appendleft(self._preloaded)
+            self._preloaded = None
+
+    def _start(self, path: Source, start: float = 0.0) -> None:
+        pygame.mixer.music.load(path, getattr(path, 'namehint', ''))
+        self._apply_volume(path)
+        pygame.mixer.music.play(start=start)
+        self._offset = start
+        self.paused = False
+        self.current = path
+
+    def _halt(self) -> None:
+        # Swap the end event out so stopping doesn't look like a finished track
+        pygame.mixer.music.set_endevent()
+        pygame.mixer.music.stop()
+        pygame.event.clear(TRACK_END)
+        pygame.mixer.music.set_endevent(TRACK_END)
+        self.current = None
+        self.paused = False
+
+    def _play_next(self) -> None:
+        """Start the next track, skipping any that fail to load"""
+        while True:
+            with self._lock:
+                path = self._upcoming.popleft() if self._upcoming else None
+            if path is None:
+                self._halt()
+                self._set_idle()
+                return
+            try:
+                self._halt()
+                self._start(path)
+            except pygame.error as e:
+                print(f"Error playing {source_name(path)}: {e}")
+                continue
+            self._notify(path)
+            self._preload()
+            return
+
+    def _preload(self) -> None:
+        """Hand the next queued track to the mixer for a gapless switch"""
+        while self._preloaded is None:
+            with self._lock:
+                path = self._upcoming.popleft() if self._upcoming else None
+            if path is None:
+                return
+            try:
+                pygame.mixer.music.queue(path, getattr(path, 'namehint', ''))
+            except pygame.error as e:
+                print(f"Error queueing {source_name(path)}: {e}")
+                continue
+            self._preloaded = path
+
+    def _advance(self) -> None:
+        """The current track ended; the mixer has already started the preloaded one"""
+        if self._preloaded is None:
+            self.current = None
+            self.paused = False
+            self._set_idle()
+            return
+        self.current, self._preloaded = self._preloaded, None
+        self._offset = 0.0
+        self._apply_volume(self.current)
+        self._notify(self.current)
+        self._preload()
+
+    def _apply_volume(self, path: Source) -> None:
+        if self.volume is not None:
+            pygame.mixer.music.set_volume(self.volume(path))
+
+    def _set_idle(self) -> None:
+        self._idle.set()
+        if self.on_idle is not None:
+            self.on_idle()
+
+    def _notify(self, path: Source) -> None:
+        if self.on_track_start is not None:
+            self.on_track_start(path)
@@ -0,0 +1,135 @@
+"""Keep-alive HTTP connections shared between threads."""
+import os
+import http.client
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class DownloadCancelled(Exception):
+    """Raised when a download is stopped through its ``cancelled`` event"""
+
+
+class HttpSession:
+    """Pool of persistent HTTP(S) connections reused across requests and threads
+
+    Each host keeps up to ``max_per_host`` idle connections. A connection
+    goes back to the pool only when its response was read to the end;
+    otherwise it is closed. ``opened`` and ``requests`` show how often a
+    request could reuse an existing connection.
+    """
+    def __init__(self, max_per_host: int = 4, timeout: float = 30,
+                 headers: Optional[Dict[str, str]] = None):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.opened = 0
+        self.requests = 0
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme: str, host: str) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, timeout=self.timeout), False
+
+    def _release(self, scheme: str, host: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, url: str, headers: Dict[str, str]):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn, reused = self._acquire(parts.scheme, parts.netloc)
+        try:
+            conn.request('GET', path, headers={**self.headers, **headers})
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+            # The server dropped an idle connection; retry once on a fresh one
+            with self._lock:
+                self.opened += 1
+            conn = type(conn)(parts.netloc, timeout=self.timeout)
+            conn.request('GET', path, headers={**self.headers, **headers})
+            response = conn.getresponse()
+        with self._lock:
+            self.requests += 1
+        return parts, conn, response
+
+    @contextmanager
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            max_redirects: int = 5) -> Iterator[http.client.HTTPResponse]:
+        """GET a URL, following redirects; yields the response to read from"""
+        headers = headers or {}
+        for _ in range(max_redirects + 1):
+            parts, conn, response = self._send(url, headers)
+            location = response.getheader('Location')
+            if response.status not in REDIRECTS or not location:
+                break
+            response.read()
+            self._finish(parts, conn, response)
+            url = urljoin(url, location)
+        else:
+            raise http.client.HTTPException(f"Too many redirects for {url}")
+        try:
+            yield response
+        finally:
+            self._finish(parts, conn, response)
+
+    def _finish(self, parts, conn: http.client.HTTPConnection, response: http.client.HTTPResponse) -> None:
+        if response.isclosed() and not response.will_close:
+            self._release(parts.scheme, parts.netloc, conn)
+        else:
+            conn.close()
+
+    def download(self, url: str, path: str, cancelled: Optional[threading.Event] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """Save a URL to ``path`` in chunks, checking ``cancelled`` between them
+
+        Returns the number of bytes written. A cancelled or failed download
+        leaves no file behind.
+        """
+        written = 0
+        try:
+            with self.get(url) as response, open(path, 'wb') as out:
+                if response.status != 200:
+                    raise http.client.HTTPException(f"HTTP {response.status} for {url}")
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise DownloadCancelled(url)
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    written += len(chunk)
+        except BaseException:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise
+        return written
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
@@ -0,0 +1,196 @@
+"""Persistent, incrementally updated index of local music files."""
+import os
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from metadata import UnsupportedFormat, probe
+
+DEFAULT_LIBRARY_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'music_player', 'library.db')
+AUDIO_EXTENSIONS = ('.mp3', '.wav')
+WRITE_BATCH = 500
+
+
+class Track(NamedTuple):
+    path: str
+    title: str
+    artist: str
+    album: str
+    duration: float
+    bitrate: int
+
+
+class ScanStats(NamedTuple):
+    seen: int
+    added: int
+    updated: int
+    removed: int
+    failed: int
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    artist TEXT NOT NULL DEFAULT '',
+    album TEXT NOT NULL DEFAULT '',
+    duration REAL NOT NULL DEFAULT 0,
+    bitrate INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# External-content FTS index kept in sync with the tracks table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, album, content='tracks', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+        VALUES ('delete', old.id, old.title, old.artist, old.album);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+        VALUES ('delete', old.id, old.title, old.artist, old.album);
+    INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album);
+END;
+"""
+
+
+def _list_dir(path: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """List the audio files (path, size, mtime) and subdirectories of a directory"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                        stat = entry.stat()
+                        files.append((os.path.abspath(entry.path), stat.st_size, stat.st_mtime_ns))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, dirs
+
+
+def _read_tags(path: str) -> Optional[Tuple[str, str, str, float, int]]:
+    try:
+        info = probe(path)
+    except (OSError, UnsupportedFormat, ValueError, IndexError):
+        return None
+    title = info.tags.get('title') or os.path.splitext(os.path.basename(path))[0]
+    return title, info.tags.get('artist', ''), info.tags.get('album', ''), info.duration, info.bitrate
+
+
+class MusicLibrary:
+    """SQLite index of local tracks with full-text search on title/artist/album
+
+    ``scan`` walks directories and probes files on a thread pool, and only
+    probes files whose size or mtime differ from the stored row, so rescans
+    of an unchanged library just stat the files. When this SQLite build
+    lacks FTS5, search falls back to LIKE queries.
+    """
+    def __init__(self, path: str = DEFAULT_LIBRARY_PATH, workers: Optional[int] = None):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(_SCHEMA)
+        try:
+            self.db.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __len__(self) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def scan(self, roots: Iterable[str]) -> ScanStats:
+        """Index every audio file under ``roots``, re-probing only changed files"""
+        roots = [os.path.abspath(root) for root in roots]
+        known: Dict[str, Tuple[int, int]] = {}
+        for root in roots:
+            prefix = os.path.join(root, '')
+            rows = self.db.execute(
+                'SELECT path, size, mtime FROM tracks WHERE substr(path, 1, ?) = ?',
+                (len(prefix), prefix))
+            known.update((path, (size, mtime)) for path, size, mtime in rows)
+
+        seen = set()
+        added = updated = failed = 0
+        pending_rows = []
+        with ThreadPoolExecutor(self.workers) as pool:
+            listing = {pool.submit(_list_dir, root) for root in roots}
+            probing = {}
+            while listing or probing:
+                done, _ = wait(listing | set(probing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in listing:
+                        listing.discard(future)
+                        files, dirs = future.result()
+                        listing.update(pool.submit(_list_dir, d) for d in dirs)
+                        for path, size, mtime in files:
+                            seen.add(path)
+                            if known.get(path) != (size, mtime):
+                                probing[pool.submit(_read_tags, path)] = (path, size, mtime)
+                    else:
+                        path, size, mtime = probing.pop(future)
+                        tags = future.result()
+                        if tags is None:
+                            failed += 1
+                            continue
+                        if path in known:
+                            updated += 1
+                        else:
+                            added += 1
+                        pending_rows.append((path, size, mtime) + tags)
+                        if len(pending_rows) >= WRITE_BATCH:
+                            self._write(pending_rows)
+                            pending_rows = []
+        self._write(pending_rows)
+
+        removed = [(path,) for path in known if path not in seen]
+        self.db.executemany('DELETE FROM tracks WHERE path = ?', removed)
+        self.db.commit()
+        return ScanStats(len(seen), added, updated, len(removed), failed)
+
+    def _write(self, rows: List[tuple]) -> None:
+        self.db.executemany(
+            'INSERT INTO tracks (path, size, mtime, title, artist, album, duration, bitrate) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime, '
+            'title=excluded.title, artist=excluded.artist, album=excluded.album, '
+            'duration=excluded.duration, bitrate=excluded.bitrate', rows)
+        self.db.commit()
+
+    def search(self, query: str, limit: int = 20) -> List[Track]:
+        """Find tracks whose title, artist or album match every word of ``query``"""
+        words = query.split()
+        if not words:
+            return []
+        columns = 'tracks.path, tracks.title, tracks.artist, tracks.album, tracks.duration, tracks.bitrate'
+        if self.has_fts:
+            # Quote each word and match it as a prefix
+            match = ' '.join('"' + word.replace('"', '""') + '"*' for word in words)
+            rows = self.db.execute(
+                f'SELECT {columns} FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid '
+                'WHERE tracks_fts MATCH ? ORDER BY bm25(tracks_fts) LIMIT ?', (match, limit))
+        else:
+            condition = ' AND '.join(['(title LIKE ? OR artist LIKE ? OR album LIKE ?)'] * len(words))
+            params = [f'%{word}%' for word in words for _ in range(3)]
+            rows = self.db.execute(f'SELECT {columns} FROM tracks WHERE {condition} LIMIT ?',
+                                   params + [limit])
+        return [Track(*row) for row in rows]
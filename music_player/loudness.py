@@ -0,0 +1,376 @@
+"""Integrated loudness and peak analysis (ITU-R BS.1770 / EBU R128) for volume normalization."""
+import os
+import sys
+import json
+import wave
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from transcode import TranscodeError
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'music_player', 'loudness.json')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac', '.m4a', '.mp4')
+
+# ReplayGain 2.0 reference level
+TARGET_LUFS = -18.0
+# Frames decoded and filtered at a time; memory use does not grow with track length
+BLOCK_FRAMES = 1 << 16
+# Length of the FIR approximation of the K-weighting filter
+FIR_TAPS = 4096
+# Output of ffmpeg when it decodes formats the wave module can't read
+FFMPEG_RATE = 48000
+FFMPEG_CHANNELS = 2
+
+
+class Loudness(NamedTuple):
+    integrated: float  # LUFS; -inf for silence
+    peak: float  # largest absolute sample, 1.0 = full scale
+    gain: float  # dB to reach TARGET_LUFS
+
+    @property
+    def volume(self) -> float:
+        """Mixer volume that applies the gain; the mixer can only attenuate"""
+        return min(1.0, 10 ** (self.gain / 20))
+
+
+class PcmStream(NamedTuple):
+    sample_rate: int
+    channels: int
+    blocks: Iterator[np.ndarray]  # float32 arrays of shape (frames, channels)
+
+
+def _biquad_impulse(b: Tuple[float, float, float], a: Tuple[float, float, float],
+                    x: np.ndarray) -> np.ndarray:
+    y = np.zeros_like(x)
+    x1 = x2 = y1 = y2 = 0.0
+    for i, x0 in enumerate(x.tolist()):
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        y[i] = y0
+        x2, x1, y2, y1 = x1, x0, y1, y0
+    return y
+
+
+@lru_cache(maxsize=None)
+def k_weighting(sample_rate: int, taps: int = FIR_TAPS) -> np.ndarray:
+    """Impulse response of the BS.1770 K-weighting filter at ``sample_rate``
+
+    The shelving and high-pass biquads are designed for the given rate and
+    their cascade is truncated to ``taps`` samples, which lets blocks be
+    filtered with FFT convolution instead of a per-sample recursion.
+    """
+    # Stage 1: high shelf, +4 dB above ~1.7 kHz
+    gain, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = np.tan(np.pi * fc / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = ((vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0)
+    shelf_a = (1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+    # Stage 2: high pass at ~38 Hz
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = np.tan(np.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    hp_b = (1.0, -2.0, 1.0)
+    hp_a = (1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+
+    impulse = np.zeros(taps)
+    impulse[0] = 1.0
+    return _biquad_impulse(hp_b, hp_a, _biquad_impulse(shelf_b, shelf_a, impulse))
+
+
+class LoudnessMeter:
+    """Accumulates loudness and peak over PCM fed in blocks of any size
+
+    Each block is K-weighted by overlap-save FFT convolution, and only the
+    mean square of every 100 ms step is kept, which is all the 400 ms
+    gating blocks (75% overlap) of BS.1770 need.
+    """
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.fir = k_weighting(sample_rate)
+        self.hop = sample_rate // 10
+        self.peak = 0.0
+        self._history = np.zeros((channels, len(self.fir) - 1))
+        self._partial = np.zeros(channels)
+        self._partial_count = 0
+        self._steps: List[np.ndarray] = []
+        self._spectrum: Dict[int, np.ndarray] = {}
+
+    def _filter(self, x: np.ndarray) -> np.ndarray:
+        """K-weight a (channels, frames) block, continuing from the previous one"""
+        taps = len(self.fir)
+        padded = np.concatenate([self._history, x], axis=1)
+        self._history = padded[:, -(taps - 1):]
+        n = 1 << (padded.shape[1] - 1).bit_length()
+        spectrum = self._spectrum.get(n)
+        if spectrum is None:
+            spectrum = self._spectrum[n] = np.fft.rfft(self.fir, n)
+        filtered = np.fft.irfft(np.fft.rfft(padded, n) * spectrum, n)
+        return filtered[:, taps - 1:taps - 1 + x.shape[1]]
+
+    def feed(self, block: np.ndarray) -> None:
+        """Add a float array of shape (frames, channels) scaled to [-1, 1]"""
+        if not len(block):
+            return
+        self.peak = max(self.peak, float(np.abs(block).max()))
+        squared = self._filter(block.T.astype(np.float64)) ** 2
+
+        # Complete the step left over from the previous block
+        need = self.hop - self._partial_count
+        head = squared[:, :need]
+        self._partial += head.sum(axis=1)
+        self._partial_count += head.shape[1]
+        squared = squared[:, need:]
+        if self._partial_count < self.hop:
+            return
+        self._steps.append(self._partial / self.hop)
+
+        whole = squared.shape[1] // self.hop * self.hop
+        if whole:
+            steps = squared[:, :whole].reshape(self.channels, -1, self.hop).mean(axis=2)
+            self._steps.extend(steps.T)
+        rest = squared[:, whole:]
+        self._partial = rest.sum(axis=1)
+        self._partial_count = rest.shape[1]
+
+    def integrated(self) -> float:
+        """Gated integrated loudness in LUFS, or -inf if nothing passes the gates"""
+        if len(self._steps) < 4:
+            return float('-inf')
+        steps = np.sum(self._steps, axis=1)  # channel weights of 1.0 (mono to 5.0 front channels)
+        blocks = np.convolve(steps, np.full(4, 0.25), mode='valid')
+        with np.errstate(divide='ignore'):
+            levels = -0.691 + 10 * np.log10(blocks)
+        gated = blocks[levels > -70.0]
+        if not len(gated):
+            return float('-inf')
+        relative = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+        gated = blocks[(levels > -70.0) & (levels > relative)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def _wav_blocks(reader: wave.Wave_read, block_frames: int) -> Iterator[np.ndarray]:
+    width, channels = reader.getsampwidth(), reader.getnchannels()
+    with reader:
+        while True:
+            data = reader.readframes(block_frames)
+            if not data:
+                return
+            if width == 1:
+                samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+            elif width == 3:
+                raw = np.frombuffer(data, np.uint8).reshape(-1, 3)
+                ints = (raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8
+                        | raw[:, 2].astype(np.int8).astype(np.int32) << 16)
+                samples = ints.astype(np.float32) / (1 << 23)
+            else:
+                dtype = np.int16 if width == 2 else np.int32
+                samples = np.frombuffer(data, dtype).astype(np.float32) / (1 << (8 * width - 1))
+            yield samples.reshape(-1, channels)
+
+
+def _ffmpeg_blocks(path: str, block_frames: int) -> Iterator[np.ndarray]:
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise TranscodeError(f"ffmpeg is needed to decode {os.path.basename(path)}")
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-i', path, '-vn', '-f', 'f32le',
+               '-ac', str(FFMPEG_CHANNELS), '-ar', str(FFMPEG_RATE), '-']
+    frame_bytes = 4 * FFMPEG_CHANNELS
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(block_frames * frame_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % frame_bytes
+            yield np.frombuffer(data[:usable], np.float32).reshape(-1, FFMPEG_CHANNELS)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+    if process.returncode not in (0, -9):
+        raise TranscodeError(f"ffmpeg could not decode {os.path.basename(path)}")
+
+
+def decode_pcm(path: str, block_frames: int = BLOCK_FRAMES) -> PcmStream:
+    """Decode a file into blocks of float samples, with the wave module or ffmpeg"""
+    try:
+        reader = wave.open(path, 'rb')
+    except (wave.Error, EOFError):
+        return PcmStream(FFMPEG_RATE, FFMPEG_CHANNELS, _ffmpeg_blocks(path, block_frames))
+    return PcmStream(reader.getframerate(), reader.getnchannels(), _wav_blocks(reader, block_frames))
+
+
+def analyze(path: str, target: float = TARGET_LUFS, block_frames: int = BLOCK_FRAMES) -> Loudness:
+    """Measure a file's integrated loudness and peak, and the gain to reach ``target``"""
+    stream = decode_pcm(path, block_frames)
+    meter = LoudnessMeter(stream.sample_rate, stream.channels)
+    for block in stream.blocks:
+        meter.feed(block)
+    integrated = meter.integrated()
+    gain = target - integrated if np.isfinite(integrated) else 0.0
+    return Loudness(integrated, meter.peak, gain)
+
+
+class LoudnessCache:
+    """On-disk JSON cache of loudness results keyed by path, size and mtime"""
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, file_path: str) -> Optional[Loudness]:
+        key = os.path.abspath(file_path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return Loudness(**entry['loudness'])
+        return None
+
+    def put(self, file_path: str, loudness: Loudness, save: bool = True) -> None:
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        with self._lock:
+            self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                                 'loudness': loudness._asdict()}
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        """Write the cache atomically"""
+        with self._lock:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+
+def find_audio(roots: Iterable[str]) -> Iterator[str]:
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for folder, _, files in os.walk(root):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(folder, name)
+
+
+def analyze_folder(roots: Iterable[str], cache: LoudnessCache, workers: Optional[int] = None,
+                   on_result: Optional[Callable[[str, Optional[Loudness]], None]] = None) -> Tuple[int, int]:
+    """Analyze every uncached audio file under ``roots`` on a process pool
+
+    Returns (analyzed, failed). ``on_result`` is called with each path and
+    its result, or None if it could not be decoded.
+    """
+    paths = [path for path in find_audio(roots) if cache.get(path) is None]
+    analyzed = failed = 0
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(analyze, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except (OSError, EOFError, wave.Error, TranscodeError, ValueError):
+                result = None
+            if result is None:
+                failed += 1
+            else:
+                analyzed += 1
+                cache.put(path, result, save=False)
+            if on_result is not None:
+                on_result(path, result)
+    cache.save()
+    return analyzed, failed
+
+
+class Normalizer:
+    """Supplies per-track mixer volumes, analyzing new tracks in the background
+
+    ``prepare`` queues a track for analysis on a worker process unless its
+    result is cached; ``volume`` only reads the cache, so the playback
+    engine never waits on analysis and plays unanalyzed tracks at full volume.
+    ``on_ready`` is called with a path once its analysis has been cached.
+    """
+    def __init__(self, cache: Optional[LoudnessCache] = None, workers: int = 1,
+                 on_ready: Optional[Callable[[str], None]] = None):
+        self.cache = cache or LoudnessCache()
+        self.on_ready = on_ready
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, path) -> None:
+        if not isinstance(path, str) or self.cache.get(path) is not None:
+            return
+        with self._lock:
+            if path in self._pending:
+                return
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            future = self._pending[path] = self._pool.submit(analyze, path)
+        future.add_done_callback(lambda f: self._finished(path, f))
+
+    def _finished(self, path: str, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(path, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(path, future.result())
+            if self.on_ready is not None:
+                self.on_ready(path)
+
+    def volume(self, path) -> float:
+        if not isinstance(path, str):
+            return 1.0
+        loudness = self.cache.get(path)
+        return loudness.volume if loudness else 1.0
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the loudness of audio files for normalized playback")
+    parser.add_argument('paths', nargs='+', help="files or folders to analyze")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    def report(path, result):
+        if result is None:
+            print(f"failed  {path}")
+        else:
+            print(f"{result.integrated:6.1f} LUFS  peak {result.peak:.2f}  gain {result.gain:+.1f} dB  {path}")
+
+    analyzed, failed = analyze_folder(args.paths, LoudnessCache(), args.workers, report)
+    print(f"Analyzed {analyzed} files, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Read duration, bitrate and tags from MP3 and WAV headers without decoding audio."""
+import os
+import json
+import struct
+import tempfile
+from typing import Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'music_player', 'metadata.json')
+
+# How much of the file to scan for the first MP3 frame after the ID3 tag
+MP3_SCAN_BYTES = 64 * 1024
+
+
+class UnsupportedFormat(ValueError):
+    """Raised when a file is not a recognizable MP3 or WAV file"""
+
+
+class AudioInfo(NamedTuple):
+    format: str
+    duration: float
+    bitrate: int  # kbps
+    sample_rate: int
+    channels: int
+    tags: Dict[str, str]
+
+
+# MP3 frame header tables, indexed by [version][layer] and [version]
+_MPEG1, _MPEG2, _MPEG25 = 3, 2, 0
+_BITRATES = {
+    (_MPEG1, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (_MPEG1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (_MPEG1, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (_MPEG2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (_MPEG2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (_MPEG2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    _MPEG1: (44100, 48000, 32000),
+    _MPEG2: (22050, 24000, 16000),
+    _MPEG25: (11025, 12000, 8000),
+}
+
+_ID3_TEXT_FRAMES = {
+    'TIT2': 'title', 'TPE1': 'artist', 'TALB': 'album', 'TCON': 'genre',
+    'TYER': 'year', 'TDRC': 'year', 'TRCK': 'track', 'TLEN': 'length_ms',
+    # ID3v2.2 uses three-letter frame IDs
+    'TT2': 'title', 'TP1': 'artist', 'TAL': 'album', 'TCO': 'genre',
+    'TYE': 'year', 'TRK': 'track', 'TLE': 'length_ms',
+}
+_WAV_INFO_TAGS = {b'INAM': 'title', b'IART': 'artist', b'IPRD': 'album',
+                  b'IGNR': 'genre', b'ICRD': 'year', b'ITRK': 'track'}
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_text(data: bytes) -> str:
+    """Decode an ID3v2 text frame body"""
+    if not data:
+        return ''
+    encoding, body = data[0], data[1:]
+    if encoding == 1:
+        text = body.decode('utf-16', errors='replace')
+    elif encoding == 2:
+        text = body.decode('utf-16-be', errors='replace')
+    elif encoding == 3:
+        text = body.decode('utf-8', errors='replace')
+    else:
+        text = body.decode('latin-1')
+    return text.split('\x00')[0].strip()
+
+
+def id3v2_size(header: bytes) -> int:
+    """Total size of the ID3v2 tag whose first 10 bytes are ``header``, or 0 if there is none"""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = _syncsafe(header[6:10]) + 10
+    if header[5] & 0x10:
+        size += 10  # footer
+    return size
+
+
+def _parse_id3v2(f) -> Tuple[int, Dict[str, str]]:
+    """Parse an ID3v2 tag at the start of the file, returning (tag size, tags)"""
+    header = f.read(10)
+    size = id3v2_size(header)
+    if not size:
+        return 0, {}
+    major, flags = header[3], header[5]
+    body = f.read(size - 10)
+
+    tags: Dict[str, str] = {}
+    pos = 0
+    if flags & 0x40 and major >= 3:  # extended header
+        ext = body[0:4]
+        pos = _syncsafe(ext) if major == 4 else struct.unpack('>I', ext)[0] + 4
+    id_len, header_len = (3, 6) if major == 2 else (4, 10)
+    while pos + header_len <= len(body):
+        frame_id = body[pos:pos + id_len]
+        if not frame_id.strip(b'\x00'):
+            break  # padding
+        if major == 2:
+            frame_size = int.from_bytes(body[pos + 3:pos + 6], 'big')
+        elif major == 4:
+            frame_size = _syncsafe(body[pos + 4:pos + 8])
+        else:
+            frame_size = struct.unpack('>I', body[pos + 4:pos + 8])[0]
+        name = _ID3_TEXT_FRAMES.get(frame_id.decode('latin-1'))
+        if name and name not in tags:
+            text = _decode_text(body[pos + header_len:pos + header_len + frame_size])
+            if text:
+                tags[name] = text
+        pos += header_len + frame_size
+    return size, tags
+
+
+def _parse_id3v1(f, file_size: int) -> Dict[str, str]:
+    if file_size < 128:
+        return {}
+    f.seek(file_size - 128)
+    data = f.read(128)
+    if data[:3] != b'TAG':
+        return {}
+    tags = {}
+    for name, start, end in (('title', 3, 33), ('artist', 33, 63), ('album', 63, 93), ('year', 93, 97)):
+        value = data[start:end].split(b'\x00')[0].decode('latin-1').strip()
+        if value:
+            tags[name] = value
+    return tags
+
+
+def _parse_frame_header(header: bytes) -> Optional[Tuple[int, int, int, int, int, int]]:
+    """Decode a 4-byte MP3 frame header
+
+    Returns (version, layer, bitrate kbps, sample rate, channels, frame
+    length in bytes), or None if the bytes are not a valid header.
+    """
+    b1, b2, b3 = header[1], header[2], header[3]
+    if header[0] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[(_MPEG1 if version == _MPEG1 else _MPEG2, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if b3 >> 6 == 3 else 2
+    if layer == 3:  # Layer I
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        slots = 144 if layer == 2 or version == _MPEG1 else 72
+        length = slots * bitrate * 1000 // sample_rate + padding
+    return version, layer, bitrate, sample_rate, channels, length
+
+
+def _samples_per_frame(version: int, layer: int) -> int:
+    if layer == 3:
+        return 384
+    if layer == 1 and version != _MPEG1:
+        return 576
+    return 1152
+
+
+def probe_mp3(path: str) -> AudioInfo:
+    """Read MP3 duration and tags from ID3, frame headers and Xing/VBRI tags"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        audio_start, tags = _parse_id3v2(f)
+        f.seek(audio_start)
+        window = f.read(MP3_SCAN_BYTES)
+
+        # Find the first frame whose successor also has a valid header
+        frame = None
+        pos = window.find(b'\xff')
+        while 0 <= pos <= len(window) - 4:
+            header = _parse_frame_header(window[pos:pos + 4])
+            if header:
+                following = window[pos + header[5]:pos + header[5] + 4]
+                if len(following) < 4 or _parse_frame_header(following):
+                    frame = header
+                    break
+            pos = window.find(b'\xff', pos + 1)
+        if frame is None:
+            raise UnsupportedFormat(f"No MPEG audio frames found in {path}")
+
+        for name, value in _parse_id3v1(f, file_size).items():
+            tags.setdefault(name, value)
+        has_id3v1 = file_size >= 128 and f.seek(file_size - 128) >= 0 and f.read(3) == b'TAG'
+
+    version, layer, bitrate, sample_rate, channels, _ = frame
+    samples = _samples_per_frame(version, layer)
+    frames = audio_bytes = None
+
+    # Xing/Info tag sits after the side information of the first frame
+    if version == _MPEG1:
+        side_info = 17 if channels == 1 else 32
+    else:
+        side_info = 9 if channels == 1 else 17
+    xing = window[pos + 4 + side_info:pos + 4 + side_info + 16]
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        offset = 8
+        if flags & 0x01:
+            frames = struct.unpack('>I', xing[offset:offset + 4])[0]
+            offset += 4
+        if flags & 0x02:
+            audio_bytes = struct.unpack('>I', xing[offset:offset + 4])[0]
+    else:
+        vbri = window[pos + 36:pos + 54]
+        if vbri[:4] == b'VBRI':
+            audio_bytes, frames = struct.unpack('>II', vbri[10:18])
+
+    if audio_bytes is None:
+        audio_bytes = file_size - audio_start - pos - (128 if has_id3v1 else 0)
+    if frames:
+        duration = frames * samples / sample_rate
+        bitrate = round(audio_bytes * 8 / duration / 1000) if duration else bitrate
+    else:
+        duration = audio_bytes * 8 / (bitrate * 1000)
+
+    tags.pop('length_ms', None)
+    return AudioInfo('mp3', duration, bitrate, sample_rate, channels, tags)
+
+
+def probe_wav(path: str) -> AudioInfo:
+    """Read WAV duration and tags from the RIFF chunk headers"""
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            raise UnsupportedFormat(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        data_size = None
+        tags: Dict[str, str] = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            next_chunk = f.tell() + size + (size & 1)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+            elif chunk_id == b'data':
+                data_size = size
+            elif chunk_id == b'LIST' and f.read(4) == b'INFO':
+                info = f.read(size - 4)
+                pos = 0
+                while pos + 8 <= len(info):
+                    tag_id, tag_size = info[pos:pos + 4], struct.unpack('<I', info[pos + 4:pos + 8])[0]
+                    name = _WAV_INFO_TAGS.get(tag_id)
+                    if name:
+                        tags[name] = info[pos + 8:pos + 8 + tag_size].split(b'\x00')[0].decode(
+                            'latin-1').strip()
+                    pos += 8 + tag_size + (tag_size & 1)
+            f.seek(next_chunk)
+    if fmt is None or data_size is None:
+        raise UnsupportedFormat(f"{path} has no fmt or data chunk")
+    _, channels, sample_rate, byte_rate, _, _ = fmt
+    duration = data_size / byte_rate if byte_rate else 0.0
+    return AudioInfo('wav', duration, byte_rate * 8 // 1000, sample_rate, channels, tags)
+
+
+def probe(path: str) -> AudioInfo:
+    """Read audio metadata from file headers, picking the parser by content"""
+    with open(path, 'rb') as f:
+        magic = f.read(12)
+    if magic[:4] == b'RIFF' and magic[8:12] == b'WAVE':
+        return probe_wav(path)
+    return probe_mp3(path)
+
+
+class MetadataCache:
+    """On-disk JSON cache of probe results keyed by path, size and mtime"""
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def probe(self, file_path: str) -> AudioInfo:
+        """Get metadata for a file, probing it only if it changed since last time"""
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return AudioInfo(**entry['info'])
+        info = probe(key)
+        self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'info': info._asdict()}
+        self.save()
+        return info
+
+    def save(self) -> None:
+        """Write the cache atomically"""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
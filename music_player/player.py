@@ -1,49 +1,131 @@
-import pygame
 import os
-import time
+from engine import PlaybackEngine
+from library import MusicLibrary
+from loudness import Normalizer
+from metadata import MetadataCache, UnsupportedFormat
 
-def play_music(file_path):
-    # Initialize pygame mixer
-    pygame.mixer.init()
-    
+def format_duration(seconds):
+    """Format a duration in seconds as m:ss"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def show_track(file_path):
+    """Print the name, tags and duration of a track"""
+    # Get the length of the audio file from its headers, without decoding it
     try:
-        # Load and play the music file
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.play()
-        
-        # Get the length of the audio file (in seconds)
-        audio = pygame.mixer.Sound(file_path)
-        duration = audio.get_length()
-        
-        print(f"Now playing: {os.path.basename(file_path)}")
+        info = MetadataCache().probe(file_path)
+    except (OSError, UnsupportedFormat):
+        info = None
+
+    print(f"\nNow playing: {os.path.basename(file_path)}")
+    if info:
+        title = info.tags.get('title')
+        artist = info.tags.get('artist')
+        if title:
+            print(f"{title} - {artist}" if artist else title)
+        print(f"Duration: {format_duration(info.duration)} ({info.bitrate} kbps)")
+
+def play_music(file_path, engine=None):
+    """Play a single file and wait for it to finish"""
+    owns_engine = engine is None
+    if owns_engine:
+        engine = PlaybackEngine(on_track_start=show_track)
+
+    try:
+        engine.enqueue(file_path)
         print("Press Ctrl+C to stop the music")
-        
-        # Keep the program running while the music plays
-        while pygame.mixer.music.get_busy():
-            time.sleep(1)
-            
+
+        # Wait for the end-of-track event instead of polling the mixer
+        engine.wait()
+
     except KeyboardInterrupt:
         # Handle the Ctrl+C interrupt
         print("\nStopping music playback...")
+        engine.clear()
     except Exception as e:
         print(f"Error: {str(e)}")
     finally:
         # Clean up
-        pygame.mixer.music.stop()
-        pygame.mixer.quit()
+        if owns_engine:
+            engine.shutdown()
+
+def print_help():
+    print("Enter a file path to add it to the queue, or a command:")
+    print("  p          pause/resume")
+    print("  n          next track")
+    print("  s <secs>   seek within the current track")
+    print("  l          list the queue")
+    print("  scan <dir> add a folder to the music library")
+    print("  f <text>   search the library by title/artist/album")
+    print("  a <n>      add search result n to the queue")
+    print("  q          quit")
 
 def main():
     print("Simple Music Player")
     print("-----------------")
-    
-    # Get the music file path from user
-    file_path = input("Enter the path to your music file (mp3/wav): ")
-    
-    # Check if file exists
-    if os.path.exists(file_path):
-        play_music(file_path)
-    else:
-        print("Error: File not found!")
+    print_help()
+
+    # Tracks are analyzed in the background as they are queued and played at matched loudness
+    normalizer = Normalizer(on_ready=lambda path: engine.refresh_volume())
+    engine = PlaybackEngine(on_track_start=show_track, volume=normalizer.volume)
+    library = MusicLibrary()
+
+    def enqueue(path):
+        normalizer.prepare(path)
+        engine.enqueue(path)
+
+    results = []
+    try:
+        while True:
+            command = input("> ").strip()
+            if not command:
+                continue
+            if command == 'q':
+                break
+            elif command == 'p':
+                engine.toggle_pause()
+            elif command == 'n':
+                engine.skip()
+            elif command.startswith('s '):
+                try:
+                    engine.seek(float(command[2:]))
+                except ValueError:
+                    print("Please enter the position in seconds!")
+            elif command == 'l':
+                for i, path in enumerate(engine.queued, 1):
+                    print(f"{i}. {os.path.basename(path)}")
+            elif command.startswith('scan '):
+                folder = command[5:].strip()
+                if os.path.isdir(folder):
+                    stats = library.scan([folder])
+                    print(f"Indexed {stats.seen} files ({stats.added} new, {stats.updated} changed, "
+                          f"{stats.removed} removed); library has {len(library)} tracks")
+                else:
+                    print("Error: Folder not found!")
+            elif command.startswith('f '):
+                results = library.search(command[2:])
+                if not results:
+                    print("No tracks found!")
+                for i, track in enumerate(results, 1):
+                    artist = f" - {track.artist}" if track.artist else ""
+                    print(f"{i}. {track.title}{artist} ({format_duration(track.duration)})")
+            elif command.startswith('a '):
+                try:
+                    enqueue(results[int(command[2:]) - 1].path)
+                except (ValueError, IndexError):
+                    print("Please enter a valid result number!")
+            elif os.path.exists(command):
+                # Check if file exists
+                enqueue(command)
+            else:
+                print("Error: File not found!")
+                print_help()
+    except (KeyboardInterrupt, EOFError):
+        print("\nStopping music playback...")
+    finally:
+        engine.shutdown()
+        normalizer.shutdown()
+        library.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
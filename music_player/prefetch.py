@@ -0,0 +1,123 @@
+"""Background resolution and download of upcoming playlist entries."""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+# resolve(entry, cancelled) -> result; should give up once ``cancelled`` is set
+Resolver = Callable[[str, threading.Event], Any]
+
+
+class _Job:
+    __slots__ = ('entry', 'cancelled', 'future')
+
+    def __init__(self, entry: str):
+        self.entry = entry
+        self.cancelled = threading.Event()
+        self.future: Optional[Future] = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class Prefetcher:
+    """Playlist whose next ``depth`` entries are resolved on a thread pool
+
+    Entries are handed to ``resolve`` in playlist order, but only the first
+    ``depth`` of them are ever in flight or finished-and-waiting; the rest
+    wait until ``next`` takes an entry off the front. Downloads therefore
+    stay a bounded distance ahead of playback. Removing or clearing entries
+    cancels their jobs: queued ones never start and running ones see their
+    ``cancelled`` event set.
+    """
+    def __init__(self, resolve: Resolver, depth: int = 2, workers: int = 2):
+        self.resolve = resolve
+        self.depth = max(depth, 1)
+        self._jobs: Deque[_Job] = deque()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+
+    def _fill(self) -> None:
+        """Start jobs for the first ``depth`` entries; caller holds the lock"""
+        for i, job in enumerate(self._jobs):
+            if i >= self.depth:
+                break
+            if job.future is None:
+                job.future = self._pool.submit(self.resolve, job.entry, job.cancelled)
+
+    def add(self, entry: str) -> None:
+        with self._lock:
+            self._jobs.append(_Job(entry))
+            self._fill()
+
+    def extend(self, entries: List[str]) -> None:
+        with self._lock:
+            self._jobs.extend(_Job(entry) for entry in entries)
+            self._fill()
+
+    def remove(self, index: int) -> str:
+        """Drop the entry at ``index`` (0 is next up), cancelling its download"""
+        with self._lock:
+            job = self._jobs[index]
+            del self._jobs[index]
+            job.cancel()
+            self._fill()
+            return job.entry
+
+    def clear(self) -> None:
+        """Drop every entry, cancelling all downloads"""
+        with self._lock:
+            jobs, self._jobs = self._jobs, deque()
+        for job in jobs:
+            job.cancel()
+
+    @property
+    def entries(self) -> List[str]:
+        with self._lock:
+            return [job.entry for job in self._jobs]
+
+    def ready(self) -> int:
+        """Number of entries at the front whose download has finished"""
+        with self._lock:
+            count = 0
+            for job in self._jobs:
+                if job.future is None or not job.future.done():
+                    break
+                count += 1
+            return count
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def pop(self) -> Optional[Tuple[str, Future, threading.Event]]:
+        """Take the next entry without waiting; None when the playlist is empty
+
+        Returns the entry, the future of its download and the event that
+        cancels it, for callers that wait in their own way (e.g. asyncio).
+        """
+        with self._lock:
+            if not self._jobs:
+                return None
+            job = self._jobs.popleft()
+            self._fill()
+        return job.entry, job.future, job.cancelled
+
+    def next(self) -> Optional[Tuple[str, Any]]:
+        """Take the next entry, waiting for its download; None when the playlist is empty
+
+        If the resolver raised, the exception is re-raised here; the entry
+        has been taken off the playlist either way.
+        """
+        job = self.pop()
+        if job is None:
+            return None
+        entry, future, _ = job
+        # Once popped, a job is out of reach of remove and clear, so its future is never cancelled
+        return entry, future.result()
+
+    def close(self) -> None:
+        """Cancel outstanding downloads and stop the worker threads"""
+        self.clear()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,155 @@
+"""Cached, coalescing search layer in front of a pluggable search backend."""
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'music_player', 'search.json')
+
+# backend(query, limit) -> list of result dicts
+SearchBackend = Callable[[str, int], List[dict]]
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: case-folded with whitespace collapsed"""
+    return ' '.join(query.casefold().split())
+
+
+def youtube_backend(query: str, limit: int) -> List[dict]:
+    """Search YouTube, keeping only the fields the player uses"""
+    from youtubesearchpython import VideosSearch
+    results = VideosSearch(query, limit=limit).result().get('result', [])
+    return [{'id': video.get('id'), 'title': video.get('title', 'Unknown title'),
+             'duration': video.get('duration', 'Unknown duration'), 'link': video.get('link')}
+            for video in results]
+
+
+class SearchService:
+    """Search front end with an in-memory LRU, a persistent TTL cache and request coalescing
+
+    Lookups go to the LRU first, then the on-disk cache (entries older than
+    ``ttl`` seconds are ignored), and only then to the backend. Concurrent
+    lookups of the same normalized query share a single backend request.
+    ``search_many`` resolves a list of queries on a bounded worker pool.
+    """
+    def __init__(self, backend: SearchBackend = youtube_backend, limit: int = 5,
+                 ttl: float = 24 * 3600, memory_size: int = 256,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH, workers: int = 4):
+        self.backend = backend
+        self.limit = limit
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.cache_path = cache_path
+        self.workers = workers
+        self.requests = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self._memory: 'OrderedDict[str, List[dict]]' = OrderedDict()
+        self._disk: Optional[Dict[str, dict]] = None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _load_disk(self) -> Dict[str, dict]:
+        if self._disk is None:
+            self._disk = {}
+            if self.cache_path:
+                try:
+                    with open(self.cache_path, encoding='utf-8') as f:
+                        self._disk = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._disk
+
+    def _save_disk(self) -> None:
+        if not self.cache_path:
+            return
+        now = time.time()
+        entries = {key: entry for key, entry in self._disk.items() if now - entry['time'] < self.ttl}
+        directory = os.path.dirname(self.cache_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _remember(self, key: str, results: List[dict]) -> None:
+        self._memory[key] = results
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _cached(self, key: str) -> Optional[List[dict]]:
+        """Look a key up in memory, then on disk; caller holds the lock"""
+        results = self._memory.get(key)
+        if results is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return results
+        entry = self._load_disk().get(key)
+        if entry is not None and time.time() - entry['time'] < self.ttl:
+            self._remember(key, entry['results'])
+            self.disk_hits += 1
+            return entry['results']
+        return None
+
+    def search(self, query: str) -> List[dict]:
+        """Get results for a query, from cache when possible"""
+        key = normalize_query(query)
+        if not key:
+            return []
+        with self._lock:
+            results = self._cached(key)
+            if results is not None:
+                return results
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            results = self.backend(key, self.limit)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.requests += 1
+            self._remember(key, results)
+            self._load_disk()[key] = {'time': time.time(), 'results': results}
+            self._save_disk()
+            del self._in_flight[key]
+        future.set_result(results)
+        return results
+
+    def search_many(self, queries: Sequence[str]) -> List[Optional[List[dict]]]:
+        """Resolve many queries concurrently, in order; failed lookups give None"""
+        def lookup(query: str) -> Optional[List[dict]]:
+            try:
+                return self.search(query)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(lookup, queries))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,427 @@
+"""Progressive download-and-play of audio served over HTTP."""
+import io
+import os
+import time
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from typing import Callable, List, Optional, Tuple
+
+from metadata import id3v2_size
+from transcode import TranscodeError, ffmpeg_command, is_mixer_format
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_PREBUFFER = 256 * 1024
+# Decoders look for tags at the end of the file before playing, so fetch it first
+TAIL_SIZE = 64 * 1024
+# ffmpeg can't go back to fill in the sizes of a WAV written to a pipe, so it
+# declares the largest possible file; the mixer then reads until end of file
+PIPE_WAV_SIZE = 0xFFFFFFFF + 8
+
+
+class StreamBuffer(io.RawIOBase):
+    """Seekable reader over a file that is still being downloaded
+
+    The downloader writes byte ranges into a sparse file and reports them
+    with ``mark``; reads block until the requested bytes have arrived (or
+    the download ended) instead of hitting a premature end of file. The
+    decoder can therefore start while the download continues.
+
+    While ``fill_tail`` is set, reads from the last ``TAIL_SIZE`` bytes
+    that have not arrived yet return zeros instead of blocking, so a decoder
+    looking for trailing tags on open sees none rather than waiting for the
+    whole file. It is used when the tail could not be fetched up front.
+    """
+    def __init__(self, path: str, size: Optional[int], namehint: str = ''):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.namehint = namehint
+        self.name = path
+        self.complete = False
+        self.fill_tail = False
+        self.error: Optional[BaseException] = None
+        self._ranges: List[Tuple[int, int]] = []
+        self._file = open(path, 'rb')
+        self._pos = 0
+        self._cond = threading.Condition()
+
+    # Writer side
+
+    def mark(self, start: int, end: int) -> None:
+        """Record that bytes [start, end) are on disk"""
+        with self._cond:
+            merged = []
+            for s, e in sorted(self._ranges + [(start, end)]):
+                if merged and s <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+            self._ranges = merged
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Mark the download as finished, successfully or not"""
+        with self._cond:
+            self.complete = True
+            self.error = error
+            if self.size is None and self._ranges:
+                self.size = self._ranges[-1][1]
+            self._cond.notify_all()
+
+    # Reader side
+
+    def contiguous(self, offset: int = 0) -> int:
+        """End of the downloaded run of bytes that contains ``offset``"""
+        with self._cond:
+            for start, end in self._ranges:
+                if start <= offset < end:
+                    return end
+            return offset
+
+    @property
+    def position(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            with self._cond:
+                while self.size is None and not self.complete:
+                    self._cond.wait()
+                offset += self.size or 0
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        want = len(buffer)
+        with self._cond:
+            while True:
+                if self.size is not None and self._pos >= self.size:
+                    return 0
+                end = self.contiguous(self._pos)
+                if end > self._pos:
+                    break
+                if self.complete:
+                    return 0
+                if self.fill_tail and self.size and self._pos >= self.size - TAIL_SIZE:
+                    count = min(want, self.size - self._pos)
+                    buffer[:count] = bytes(count)
+                    self._pos += count
+                    return count
+                self._cond.wait()
+        count = min(want, end - self._pos)
+        self._file.seek(self._pos)
+        data = self._file.read(count)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+class HttpFetcher(threading.Thread):
+    """Downloads a URL into a StreamBuffer in chunks
+
+    When the server supports range requests, the last ``TAIL_SIZE`` bytes
+    are fetched first so that decoders probing the end of the file do not
+    wait for the whole download.
+    """
+    def __init__(self, url: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 headers: Optional[dict] = None):
+        super().__init__(name='stream-fetcher', daemon=True)
+        self.url = url
+        self.path = path
+        self.chunk_size = chunk_size
+        self.headers = headers or {}
+        self.buffer: Optional[StreamBuffer] = None
+        self.bytes_fetched = 0
+        self.ready = threading.Event()
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _open(self, byte_range: Optional[str] = None):
+        headers = dict(self.headers)
+        if byte_range:
+            headers['Range'] = f'bytes={byte_range}'
+        return urllib.request.urlopen(urllib.request.Request(self.url, headers=headers), timeout=30)
+
+    def _copy(self, response, offset: int) -> None:
+        with open(self.path, 'r+b') as out:
+            out.seek(offset)
+            while not self._cancelled.is_set():
+                chunk = response.read(self.chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+                out.flush()
+                self.buffer.mark(offset, offset + len(chunk))
+                offset += len(chunk)
+                self.bytes_fetched += len(chunk)
+
+    def run(self) -> None:
+        error = None
+        try:
+            response = self._open()
+            length = response.headers.get('Content-Length')
+            size = int(length) if length else None
+            accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            content_type = response.headers.get('Content-Type', '')
+            namehint = {'audio/mpeg': 'mp3', 'audio/ogg': 'ogg', 'audio/wav': 'wav',
+                        'audio/x-wav': 'wav'}.get(content_type.split(';')[0], '')
+            with open(self.path, 'wb') as out:
+                if size:
+                    out.truncate(size)
+            self.buffer = StreamBuffer(self.path, size, namehint)
+
+            if accepts_ranges and size and size > 2 * TAIL_SIZE:
+                response.close()
+                with self._open(f'{size - TAIL_SIZE}-') as tail:
+                    tail_ok = tail.status == 206
+                    if tail_ok:
+                        self._copy(tail, size - TAIL_SIZE)
+                response = self._open(f'0-{size - TAIL_SIZE - 1}' if tail_ok else None)
+                self.buffer.fill_tail = not tail_ok
+            else:
+                self.buffer.fill_tail = True
+            self.ready.set()
+            with response:
+                self._copy(response, 0)
+        except BaseException as e:
+            error = e
+        finally:
+            if self.buffer is None:
+                self.buffer = StreamBuffer(self.path, 0)
+            self.buffer.finish(error)
+            self.ready.set()
+
+
+def wav_pipe_command() -> List[str]:
+    """ffmpeg decoding whatever arrives on stdin into WAV on stdout"""
+    return ffmpeg_command('pipe:0', 'wav')
+
+
+class StreamDecoder(threading.Thread):
+    """Converts a StreamBuffer into WAV for the mixer while it downloads
+
+    The source's bytes are fed to ``command``'s stdin as they arrive and its
+    output is written to a second sparse file, exposed as ``buffer``. This is
+    how MP4 and WebM audio, which the mixer cannot decode, are streamed; the
+    source must be playable from the start, as YouTube's fragmented audio
+    streams are.
+    """
+    def __init__(self, source: StreamBuffer, path: str, command: List[str],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(name='stream-decoder', daemon=True)
+        self.source = source
+        self.path = path
+        self.command = command
+        self.chunk_size = chunk_size
+        with open(path, 'wb'):
+            pass
+        self.buffer = StreamBuffer(path, PIPE_WAV_SIZE, 'wav')
+        self._process: Optional[subprocess.Popen] = None
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+
+    def _feed(self, stdin) -> None:
+        try:
+            self.source.seek(0)
+            while not self._cancelled.is_set():
+                chunk = self.source.read(self.chunk_size)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+                stdin.flush()
+        except (OSError, ValueError):
+            pass  # the decoder exited, or the source was closed under us
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        error = None
+        try:
+            with tempfile.TemporaryFile() as errors, open(self.path, 'r+b') as out:
+                process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                           stdout=subprocess.PIPE, stderr=errors)
+                self._process = process
+                if self._cancelled.is_set():
+                    process.kill()
+                threading.Thread(target=self._feed, args=(process.stdin,),
+                                 name='stream-decoder-feed', daemon=True).start()
+                offset = 0
+                with process.stdout:
+                    while True:
+                        chunk = process.stdout.read1(self.chunk_size)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        out.flush()
+                        self.buffer.mark(offset, offset + len(chunk))
+                        offset += len(chunk)
+                code = process.wait()
+                if code != 0 and not self._cancelled.is_set():
+                    errors.seek(0)
+                    message = errors.read().decode(errors='replace').strip()
+                    raise TranscodeError(f"ffmpeg failed on the stream: {message or code}")
+        except BaseException as e:
+            error = e
+        finally:
+            self.buffer.finish(error)
+
+
+class StreamingSession:
+    """Plays a URL through a PlaybackEngine while it downloads
+
+    Playback starts once ``prebuffer`` bytes of audio are available (or the
+    download has finished); a leading ID3v2 tag, which may hold cover art,
+    does not count towards it. While playing, a monitor compares the decoder's read
+    position with the downloaded bytes; if the margin drops below a quarter
+    of the prebuffer, playback is paused until the full prebuffer has been
+    rebuilt, instead of running dry. ``time_to_first_sound``,
+    ``underruns`` and ``rebuffer_time`` record how the stream behaved.
+
+    Audio the mixer cannot play (anything but MP3, OGG, WAV or FLAC) is
+    piped through ``decode_command`` into WAV by a StreamDecoder, and the
+    prebuffer then counts decoded bytes.
+    """
+    MONITOR_INTERVAL = 0.05
+
+    def __init__(self, engine, url: str, prebuffer: int = DEFAULT_PREBUFFER,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, directory: Optional[str] = None,
+                 headers: Optional[dict] = None,
+                 decode_command: Callable[[], List[str]] = wav_pipe_command):
+        self.engine = engine
+        self.url = url
+        self.prebuffer = prebuffer
+        self.chunk_size = chunk_size
+        self.decode_command = decode_command
+        fd, self.path = tempfile.mkstemp(prefix='stream-', dir=directory)
+        os.close(fd)
+        self.fetcher = HttpFetcher(url, self.path, chunk_size, headers)
+        self.decoder: Optional[StreamDecoder] = None
+        self.time_to_first_sound: Optional[float] = None
+        self.underruns = 0
+        self.rebuffer_time = 0.0
+        self.audio_offset = 0
+        self._stopped = threading.Event()
+
+    def _buffered(self, buffer: StreamBuffer, target: int) -> bool:
+        if buffer.complete:
+            return True
+        offset = max(buffer.position, self.audio_offset)
+        return buffer.contiguous(offset) - offset >= target
+
+    def _wait_for(self, buffer: StreamBuffer, target: int) -> None:
+        while not self._buffered(buffer, target) and not self._stopped.is_set():
+            time.sleep(self.MONITOR_INTERVAL)
+
+    def play(self) -> bool:
+        """Stream and play until the track ends or ``stop`` is called
+
+        Returns False if the download failed before anything could be played.
+        """
+        start = time.perf_counter()
+        self.fetcher.start()
+        self.fetcher.ready.wait()
+        buffer = self.fetcher.buffer
+        try:
+            self._wait_for(buffer, 12)
+            if buffer.contiguous(0) > 0 and not is_mixer_format(self.path):
+                buffer = self._start_decoder(buffer)
+                if buffer is None:
+                    return False
+            else:
+                with open(self.path, 'rb') as f:
+                    self.audio_offset = id3v2_size(f.read(10))
+            self._wait_for(buffer, self.prebuffer)
+            if buffer.error is not None and buffer.contiguous(0) == 0:
+                print(f"Error streaming audio: {buffer.error}")
+                return False
+            if self._stopped.is_set():
+                return False
+
+            self.engine.enqueue(buffer)
+            low_water = self.prebuffer // 4
+            buffering_since = None
+            while not self._stopped.is_set():
+                time.sleep(self.MONITOR_INTERVAL)
+                if self.engine.current is buffer:
+                    if self.time_to_first_sound is None:
+                        self.time_to_first_sound = time.perf_counter() - start
+                        buffer.fill_tail = False
+                elif self.time_to_first_sound is not None or self.engine.wait(0):
+                    break  # the track has ended, was skipped or failed to load
+                else:
+                    continue
+
+                if buffering_since is None:
+                    if not self.engine.paused and not self._buffered(buffer, low_water):
+                        self.underruns += 1
+                        buffering_since = time.perf_counter()
+                        self.engine.pause()
+                        print("Buffering...")
+                elif self._buffered(buffer, self.prebuffer):
+                    self.rebuffer_time += time.perf_counter() - buffering_since
+                    buffering_since = None
+                    self.engine.resume()
+            return True
+        finally:
+            self.fetcher.cancel()
+            if self.decoder is not None:
+                self.decoder.cancel()
+
+    def _start_decoder(self, source: StreamBuffer) -> Optional[StreamBuffer]:
+        """Start converting the download to WAV; returns the buffer to play"""
+        try:
+            command = self.decode_command()
+        except TranscodeError as e:
+            print(f"Error streaming audio: {e}")
+            return None
+        source.fill_tail = False  # the decoder reads in order, and must never see made-up bytes
+        self.decoder = StreamDecoder(source, self.path + '.wav', command, self.chunk_size)
+        self.decoder.start()
+        return self.decoder.buffer
+
+    def stop(self) -> None:
+        """Stop waiting on the stream; the caller stops the engine"""
+        self._stopped.set()
+
+    def close(self) -> None:
+        """Release the stream's temporary file; the engine must no longer be playing it"""
+        self.fetcher.cancel()
+        if self.decoder is not None:
+            self.decoder.cancel()
+            self.decoder.join(timeout=5)
+            self.decoder.buffer.close()
+        self.fetcher.join(timeout=5)
+        if self.fetcher.buffer is not None:
+            self.fetcher.buffer.close()
+        for path in (self.path, self.path + '.wav'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,104 @@
+import os
+import sys
+import types
+import itertools
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import download_cache
+from download_cache import DownloadCache
+
+
+class StubDownloader:
+    """Writes ``size`` bytes for each URL into the work directory, like download_stream"""
+    def __init__(self, size=100):
+        self.size = size
+        self.calls = []
+
+    def __call__(self, url, output_dir):
+        self.calls.append(url)
+        path = os.path.join(output_dir, "audio.webm")
+        with open(path, "wb") as f:
+            f.write(url.encode()[:1] * self.size)
+        return path, f"Title of {url}", "251-160"
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Strictly increasing access times, so LRU order never depends on timer resolution"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(download_cache, "time", types.SimpleNamespace(time=lambda: next(ticks)))
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.startswith(".partial-") or name.endswith(".tmp")]
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    downloader = StubDownloader(size=100)
+    url = "https://www.youtube.com/watch?v=abc123"
+
+    first = cache.fetch(url, downloader)
+    second = cache.fetch(url, downloader)
+
+    assert downloader.calls == [url]
+    assert first.path == second.path == str(tmp_path / "abc123-251-160.webm")
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["bytes_saved"] == 100
+
+
+def test_index_survives_restart(tmp_path):
+    url = "https://youtu.be/abc123"
+    DownloadCache(str(tmp_path)).fetch(url, StubDownloader())
+    downloader = StubDownloader()
+    entry = DownloadCache(str(tmp_path)).fetch(url, downloader)
+    assert downloader.calls == []
+    assert entry.title == f"Title of {url}"
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=250)
+    downloader = StubDownloader(size=100)
+    a, b, c = (f"https://www.youtube.com/watch?v={v}" for v in ("aaa", "bbb", "ccc"))
+
+    cache.fetch(a, downloader)
+    cache.fetch(b, downloader)
+    cache.fetch(a, downloader)  # a is now more recent than b
+    cache.fetch(c, downloader)
+
+    assert cache.get("aaa") is not None
+    assert cache.get("ccc") is not None
+    assert cache.get("bbb") is None
+    assert not os.path.exists(tmp_path / "bbb-251-160.webm")
+    assert cache.total_bytes == 200
+
+
+def test_download_is_renamed_into_place(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    entry = cache.fetch("https://www.youtube.com/watch?v=abc123", StubDownloader())
+    assert os.path.exists(entry.path)
+    assert leftovers(str(tmp_path)) == []
+
+
+def test_failed_download_leaves_nothing(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    assert cache.fetch("https://www.youtube.com/watch?v=abc123", lambda url, output_dir: None) is None
+    assert len(cache) == 0
+    assert leftovers(str(tmp_path)) == []
+
+
+def test_urls_without_an_id_do_not_collide(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    downloader = StubDownloader()
+    first = cache.fetch("https://example.com/one.webm", downloader)
+    second = cache.fetch("https://example.com/two.webm", downloader)
+
+    assert first.path != second.path
+    assert os.path.exists(first.path) and os.path.exists(second.path)
+    assert len(cache) == 2
+    assert cache.fetch("https://example.com/one.webm", downloader).path == first.path
+    assert len(downloader.calls) == 2
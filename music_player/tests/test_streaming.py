@@ -0,0 +1,209 @@
+import io
+import os
+import sys
+import time
+import wave
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+
+from engine import PlaybackEngine
+from streaming import TAIL_SIZE, HttpFetcher, StreamingSession
+from transcode import TranscodeError
+
+WEBM_MAGIC = b"\x1aE\xdf\xa3"
+# Stand-in for ffmpeg: drops the fake container header and passes the WAV through as it arrives
+STRIP_DECODER = [sys.executable, "-c",
+                 "import sys, shutil\n"
+                 "sys.stdin.buffer.read(4)\n"
+                 "shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer, 4096)\n"]
+
+
+def make_wav(seconds=3.0, rate=44100):
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(range(256)) * int(seconds * rate * 4 / 256))
+    return out.getvalue()
+
+
+def as_piped_wav(data):
+    """The WAV as ffmpeg writes it to a pipe, with its RIFF and data sizes left at 0xFFFFFFFF"""
+    unknown = b"\xff" * 4
+    return data[:4] + unknown + data[8:40] + unknown + data[44:]
+
+
+class AudioServer(ThreadingHTTPServer):
+    """Serves ``data`` at every path, optionally with range support, ``chunk`` bytes every ``delay`` seconds"""
+    daemon_threads = True
+
+    def __init__(self, data, content_type="audio/wav", ranges=True, chunk=16 * 1024, delay=0.0):
+        super().__init__(("127.0.0.1", 0), AudioHandler)
+        self.data = data
+        self.content_type = content_type
+        self.ranges = ranges
+        self.chunk = chunk
+        self.delay = delay
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/track"
+
+
+class AudioHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        data, server = self.server.data, self.server
+        start, end = 0, len(data)
+        byte_range = self.headers.get("Range")
+        if server.ranges and byte_range:
+            first, _, last = byte_range.split("=")[1].partition("-")
+            start, end = int(first), int(last) + 1 if last else len(data)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", server.content_type)
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        try:
+            for offset in range(start, end, server.chunk):
+                self.wfile.write(data[offset:min(offset + server.chunk, end)])
+                time.sleep(server.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(data, **kwargs):
+        server = AudioServer(data, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def engine():
+    started = []
+    engine = PlaybackEngine(on_track_start=started.append)
+    engine.started = started
+    yield engine
+    engine.shutdown()
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_fetcher_delivers_every_byte_while_it_downloads(serve, tmp_path, ranges):
+    data = os.urandom(5 * TAIL_SIZE + 123)
+    server = serve(data, ranges=ranges, delay=0.005)
+    fetcher = HttpFetcher(server.url, str(tmp_path / "stream"), chunk_size=8192)
+    fetcher.start()
+    fetcher.ready.wait()
+    buffer = fetcher.buffer
+    buffer.fill_tail = False  # as the session does once playback starts
+    assert not buffer.complete
+
+    received = buffer.read()
+    fetcher.join()
+
+    assert buffer.error is None
+    assert received == data
+    assert fetcher.bytes_fetched == len(data)
+    with open(tmp_path / "stream", "rb") as f:
+        assert f.read() == data
+    buffer.close()
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def start_session(engine, url, tmp_path, **kwargs):
+    session = StreamingSession(engine, url, prebuffer=64 * 1024, directory=str(tmp_path), **kwargs)
+    thread = threading.Thread(target=session.play, daemon=True)
+    thread.start()
+    return session, thread
+
+
+def stop_session(engine, session, thread):
+    session.stop()
+    thread.join(5)
+    engine.clear()
+    engine.wait(5)
+    session.close()
+
+
+def test_playback_starts_before_the_download_finishes(serve, engine, tmp_path):
+    data = make_wav()
+    server = serve(data, delay=0.05)
+    session, thread = start_session(engine, server.url, tmp_path)
+    try:
+        wait_until(lambda: engine.started)
+        buffer = session.fetcher.buffer
+        assert engine.started == [buffer]
+        assert not buffer.complete
+        assert session.fetcher.bytes_fetched < len(data)
+
+        session.fetcher.join()
+        assert buffer.error is None
+        with open(session.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        stop_session(engine, session, thread)
+    assert not os.path.exists(session.path)
+
+
+def test_other_formats_are_decoded_as_they_arrive(serve, engine, tmp_path):
+    data = as_piped_wav(make_wav())
+    server = serve(WEBM_MAGIC + data, content_type="audio/webm", delay=0.05)
+    session, thread = start_session(engine, server.url, tmp_path, decode_command=lambda: STRIP_DECODER)
+    try:
+        wait_until(lambda: engine.started)
+        decoded = session.decoder.buffer
+        assert engine.started == [decoded]
+        assert decoded.namehint == "wav"
+        assert not session.fetcher.buffer.complete
+
+        session.fetcher.join()
+        session.decoder.join(10)
+        assert decoded.error is None
+        with open(session.decoder.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        stop_session(engine, session, thread)
+    assert not os.path.exists(session.decoder.path)
+
+
+def test_missing_decoder_fails_the_stream(serve, tmp_path):
+    server = serve(WEBM_MAGIC + bytes(100000), content_type="audio/webm")
+
+    def no_ffmpeg():
+        raise TranscodeError("ffmpeg was not found on PATH")
+
+    session = StreamingSession(None, server.url, directory=str(tmp_path), decode_command=no_ffmpeg)
+    try:
+        assert session.play() is False
+        assert session.decoder is None
+    finally:
+        session.close()
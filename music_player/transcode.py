@@ -0,0 +1,117 @@
+"""Conversion of downloaded audio into formats the pygame mixer can play."""
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+# decoder(source path, destination path, format) writes the converted file
+Decoder = Callable[[str, str, str], None]
+
+# Container/codec arguments for each output format ffmpeg can write
+FFMPEG_FORMATS = {
+    'ogg': ['-c:a', 'libvorbis', '-q:a', '5', '-f', 'ogg'],
+    'wav': ['-c:a', 'pcm_s16le', '-f', 'wav'],
+}
+
+
+class TranscodeError(RuntimeError):
+    """Raised when a file could not be converted"""
+
+
+def is_mixer_format(path: str) -> bool:
+    """Whether a file's contents (not its extension) are MP3, OGG, WAV or FLAC"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    if head[:4] in (b'OggS', b'fLaC') or head[:3] == b'ID3':
+        return True
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return True
+    # Bare MPEG audio frame sync
+    return len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+
+
+def ffmpeg_command(source: str, fmt: str) -> List[str]:
+    """ffmpeg arguments converting ``source`` (a path, or 'pipe:0' for stdin) to ``fmt`` on stdout"""
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise TranscodeError("ffmpeg was not found on PATH; install it to play YouTube audio")
+    stdin = [] if source == 'pipe:0' else ['-nostdin']
+    return [ffmpeg] + stdin + ['-loglevel', 'error', '-i', source, '-vn'] + FFMPEG_FORMATS[fmt] + ['-']
+
+
+def ffmpeg_decoder(source: str, dest: str, fmt: str = 'ogg') -> None:
+    """Convert with a local ffmpeg, copying its output to ``dest`` in chunks"""
+    command = ffmpeg_command(source, fmt)
+    with tempfile.TemporaryFile() as errors, open(dest, 'wb') as out:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            while True:
+                chunk = process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+        finally:
+            process.stdout.close()
+            code = process.wait()
+        if code != 0:
+            errors.seek(0)
+            message = errors.read().decode(errors='replace').strip()
+            raise TranscodeError(f"ffmpeg failed on {os.path.basename(source)}: {message or code}")
+
+
+def _convert(decoder: Decoder, source: str, dest: str, fmt: str) -> str:
+    """Run a decoder into a temporary file and rename it into place"""
+    tmp_path = dest + '.partial'
+    try:
+        decoder(source, tmp_path, fmt)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest
+
+
+class Transcoder:
+    """Converts files on a worker process so decoding never blocks playback
+
+    ``decoder`` must be a module-level function so it can be sent to the
+    worker. Files the mixer can already play are returned unchanged.
+    """
+    def __init__(self, decoder: Decoder = ffmpeg_decoder, fmt: str = 'ogg', workers: int = 1):
+        self.decoder = decoder
+        self.fmt = fmt
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, source: str, output_dir: str) -> Future:
+        """Start converting ``source`` into ``output_dir``; the future gives the new path"""
+        if is_mixer_format(source):
+            future: Future = Future()
+            future.set_result(source)
+            return future
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            pool = self._pool
+        base = os.path.splitext(os.path.basename(source))[0]
+        dest = os.path.join(output_dir, f"{base}.{self.fmt}")
+        return pool.submit(_convert, self.decoder, source, dest, self.fmt)
+
+    def convert(self, source: str, output_dir: str) -> str:
+        return self.submit(source, output_dir).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -1,55 +1,45 @@
-import pygame
 import os
-import time
-from pytube import YouTube
-from youtubesearchpython import VideosSearch
-import tempfile
 import shutil
+import signal
+import asyncio
+import argparse
+import tempfile
+from engine import PlaybackEngine
+from download_cache import DownloadCache
+from search_service import SearchService
+from streaming import StreamingSession
+from http_pool import DownloadCancelled, HttpSession
+from prefetch import Prefetcher
+from transcode import Transcoder, is_mixer_format
+from loudness import Normalizer
+from console import AsyncConsole
+from pytube import YouTube
 
 def setup_youtube():
     """Configure YouTube with necessary headers"""
     import pytube.innertube
     pytube.innertube._headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
 
-def search_youtube(query):
-    """Search for a video on YouTube"""
-    try:
-        # Create VideosSearch instance
-        videos_search = VideosSearch(query, limit=5)
-        results = videos_search.result().get('result', [])
-        
-        if not results:
-            print("No videos found!")
-            return None
-            
-        # Display search results
-        print("\nFound these videos:")
-        for i, video in enumerate(results, 1):
-            duration = video.get('duration', 'Unknown duration')
-            title = video.get('title', 'Unknown title')
-            print(f"{i}. {title} ({duration})")
-            
-        # Let user choose a video
-        while True:
-            try:
-                choice = input("\nEnter the number of the video you want to play (1-5) or 'q' to quit: ")
-                if choice.lower() == 'q':
-                    return None
-                    
-                choice = int(choice)
-                if 1 <= choice <= len(results):
-                    return results[choice-1].get('link')
-                else:
-                    print("Please enter a valid number!")
-            except ValueError:
-                print("Please enter a valid number or 'q' to quit!")
-                
-    except Exception as e:
-        print(f"Error searching YouTube: {str(e)}")
-        return None
+# Search results are cached in memory and on disk, keyed by the normalized query
+search_service = SearchService()
 
-def download_youtube_audio(url, output_path):
-    """Download audio from YouTube video"""
+def best_audio_stream(yt):
+    """Pick the highest bitrate audio-only stream of a video"""
+    return (
+        yt.streams
+        .filter(only_audio=True, file_extension='mp4')
+        .order_by('abr')
+        .desc()
+        .first()
+    )
+
+def download_stream(url, output_path, session=None, cancelled=None):
+    """Download the best audio stream of a YouTube video into output_path
+
+    With an HttpSession the file is fetched over its pooled connections and
+    the download stops early once ``cancelled`` is set.
+    Returns (file path, title, stream key), or None if nothing suitable was found.
+    """
     try:
         # Create a YouTube object with custom parameters
         yt = YouTube(
@@ -59,107 +49,359 @@ def download_youtube_audio(url, output_path):
         )
         
         # Get the audio stream (trying different options)
-        audio_stream = (
-            yt.streams
-            .filter(only_audio=True, file_extension='mp4')
-            .order_by('abr')
-            .desc()
-            .first()
-        )
+        audio_stream = best_audio_stream(yt)
         
         if not audio_stream:
             print("No suitable audio stream found")
-            return None, None
+            return None
             
         # Download the audio
         print(f"\nDownloading: {yt.title}")
-        audio_file = audio_stream.download(output_path=output_path)
+        if session is None:
+            audio_file = audio_stream.download(output_path=output_path)
+        else:
+            audio_file = os.path.join(output_path, audio_stream.default_filename)
+            session.download(audio_stream.url, audio_file, cancelled)
         
-        # Rename the file to have .mp3 extension
-        base, _ = os.path.splitext(audio_file)
-        new_file = base + '.mp3'
-        os.rename(audio_file, new_file)
-        
-        return new_file, yt.title
+        return audio_file, yt.title, f"{audio_stream.itag}-{audio_stream.abr}"
         
+    except DownloadCancelled:
+        return None
     except Exception as e:
         print(f"Error downloading YouTube video: {str(e)}")
+        return None
+
+# YouTube serves MP4/M4A audio, which the mixer can't play; convert it on a worker process
+transcoder = Transcoder()
+
+def download_youtube_audio(url, cache, downloader=download_stream, transcoder=transcoder):
+    """Get playable audio for a YouTube video, downloading and converting it only if it isn't cached"""
+    entry = cache.fetch(url, downloader)
+    if entry is None:
         return None, None
+    if not is_mixer_format(entry.path):
+        # The converted file replaces the download in the cache, so each video is converted once
+        work_dir = tempfile.mkdtemp(prefix='.partial-', dir=cache.directory)
+        try:
+            print(f"\nConverting: {entry.title}")
+            converted = transcoder.convert(entry.path, work_dir)
+            entry = cache.store(entry.video_id, f"{entry.stream}-{transcoder.fmt}", entry.title, converted)
+        except Exception as e:
+            print(f"Error converting audio: {str(e)}")
+            return None, None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    normalizer.prepare(entry.path)
+    return entry.path, entry.title
 
-def play_music(file_path, title):
-    """Play the downloaded audio file"""
-    # Initialize pygame mixer
-    pygame.mixer.init()
-    
+# Playback engine shared by every song, so the mixer stays initialized;
+# songs play at a volume that evens out their loudness
+normalizer = Normalizer(on_ready=lambda path: engine.refresh_volume())
+engine = PlaybackEngine(volume=normalizer.volume)
+
+def is_youtube_url(text):
+    return 'youtube.com' in text or 'youtu.be' in text
+
+def entry_url(entry):
+    """URL for a playlist entry: the entry itself, or the top search result"""
+    if is_youtube_url(entry):
+        return entry
+    results = search_service.search(entry)
+    if not results:
+        print(f"\nNo videos found for '{entry}'")
+        return None
+    return results[0].get('link')
+
+def resolve_entry(entry, cache, session, cancelled):
+    """Turn a playlist entry (URL or search term) into a downloaded (path, title)"""
+    url = None if cancelled.is_set() else entry_url(entry)
+    if url is None or cancelled.is_set():
+        return None, None
+    downloader = lambda url, output_path: download_stream(url, output_path, session, cancelled)
+    return download_youtube_audio(url, cache, downloader)
+
+def resolve_stream(entry, cancelled):
+    """Turn a playlist entry into the (stream URL, title) of its best audio stream"""
+    url = None if cancelled.is_set() else entry_url(entry)
+    if url is None or cancelled.is_set():
+        return None, None
     try:
-        # Load and play the music file
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.play()
-        
-        print(f"\nNow playing: {title}")
-        print("Press Ctrl+C to stop the music")
-        
-        # Keep the program running while the music plays
-        while pygame.mixer.music.get_busy():
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print("\nStopping music playback...")
+        yt = YouTube(url, use_oauth=True, allow_oauth_cache=True)
+        audio_stream = best_audio_stream(yt)
+        if not audio_stream:
+            print("No suitable audio stream found")
+            return None, None
+        return audio_stream.url, yt.title
     except Exception as e:
-        print(f"Error playing music: {str(e)}")
-    finally:
-        # Clean up
-        pygame.mixer.music.stop()
-        pygame.mixer.quit()
+        print(f"Error opening YouTube video: {str(e)}")
+        return None, None
+
+def print_help():
+    print("Enter a YouTube URL to queue it, or a search term to look it up. Commands:")
+    print("  <n>   queue result n of the last search")
+    print("  p     pause/resume")
+    print("  n     next song")
+    print("  l     show the playlist")
+    print("  c     clear the playlist")
+    print("  q     quit")
+    print("Ctrl+C cancels the running searches and the current download or song")
+
+class PlayerApp:
+    """Console front end running on an asyncio event loop
+
+    Searches run on executor threads and downloads on the prefetcher's
+    pool, so the prompt stays responsive: songs can be searched for and
+    queued while another one downloads or plays. Ctrl+C cancels the work
+    in progress (searches and the current download or song) and returns
+    to the prompt instead of ending the program.
+
+    Downloaded songs are handed to the engine while the previous one is
+    still playing, so it preloads them into the mixer and switches without
+    a gap. One song at a time waits in the engine; the rest stay in the
+    playlist, where they can still be cleared.
+    """
+    def __init__(self, cache, session, depth=2, stream=False):
+        self.stream = stream
+        if stream:
+            resolve = resolve_stream
+        else:
+            resolve = lambda entry, cancelled: resolve_entry(entry, cache, session, cancelled)
+        self.playlist = Prefetcher(resolve, depth=depth)
+        self.results = []
+        self.searches = set()
+        self.current = None  # cancel event of the song being fetched (or streamed)
+        self.now_playing = None
+        self.streaming = None
+        self.titles = {}  # titles of songs handed to the engine that haven't started yet
+        self._queued = None
+        self._started = None  # set once the song last handed to the engine starts, or is dropped
+
+    def queue(self, entry):
+        self.playlist.add(entry)
+        self._queued.set()
+        print(f"Queued: {entry}")
+
+    async def search(self, query):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, search_service.search, query)
+        except Exception as e:
+            print(f"\nError searching YouTube: {str(e)}")
+            return
+        if not results:
+            print(f"\nNo videos found for '{query}'")
+            return
+        self.results = results
+        print(f"\nFound these videos for '{query}':")
+        for i, video in enumerate(results, 1):
+            duration = video.get('duration', 'Unknown duration')
+            title = video.get('title', 'Unknown title')
+            print(f"{i}. {title} ({duration})")
+        print(f"Enter a number (1-{len(results)}) to queue a video")
+
+    def start_search(self, query):
+        task = asyncio.create_task(self.search(query))
+        self.searches.add(task)
+        task.add_done_callback(self.searches.discard)
+
+    def track_changed(self, source):
+        """Engine callbacks, on the event loop: ``source`` started, or None when the engine went idle"""
+        if source is None:
+            if not engine.wait(0):
+                return  # a song was handed over since; this idle spell is already over
+            self.titles.clear()
+            self.now_playing = None
+        else:
+            self.now_playing = self.titles.pop(source, None)
+            if self.now_playing:
+                print(f"\nNow playing: {self.now_playing}")
+        if self._started is not None:
+            self._started.set()
+
+    async def enqueue(self, source, title):
+        """Hand a downloaded song to the engine and wait until it starts playing
+
+        While the current song plays this only queues the new one, so the
+        engine preloads it and the switch is gapless.
+        """
+        self.titles[source] = title
+        self._started = asyncio.Event()
+        engine.enqueue(source)
+        await self._started.wait()
+
+    async def play(self, source):
+        """Stream one song and wait until it ends or is stopped"""
+        loop = asyncio.get_running_loop()
+        self.streaming = StreamingSession(engine, source)
+        try:
+            await loop.run_in_executor(None, self.streaming.play)
+        finally:
+            self.streaming.stop()
+            engine.clear()
+            await loop.run_in_executor(None, engine.wait)
+            self.streaming.close()
+            self.streaming = None
+
+    async def play_queue(self):
+        """Play the playlist in order, waiting for new entries when it runs out"""
+        while True:
+            job = self.playlist.pop()
+            if job is None:
+                self._queued.clear()
+                await self._queued.wait()
+                continue
+            entry, future, self.current = job
+            try:
+                source, title = await asyncio.wrap_future(future)
+                if source is None or self.current.is_set():
+                    continue
+                if not self.stream:
+                    self.current = None
+                    await self.enqueue(source, title)
+                    continue
+                self.now_playing = title
+                print(f"\nNow playing: {title}")
+                try:
+                    await self.play(source)
+                finally:
+                    self.now_playing = None
+            except Exception as e:
+                print(f"\nError playing {entry}: {str(e)}")
+            finally:
+                self.current = None
+
+    def stop(self):
+        """Cancel the song being fetched and stop playback"""
+        if self.current is not None:
+            self.current.set()
+        if self.streaming is not None:
+            self.streaming.stop()
+        engine.clear()
+
+    def skip(self):
+        if not self.stream and engine.current is not None:
+            engine.skip()  # on to the next song, which is usually preloaded already
+        else:
+            self.stop()
+
+    def interrupt(self):
+        """Ctrl+C: cancel running searches and the current download or song"""
+        for task in self.searches:
+            task.cancel()
+        busy = self.current is not None or self.now_playing or self.searches
+        self.skip()
+        print("\nCancelled" if busy else "\nNothing to cancel; enter 'q' to quit")
+
+    def show_playlist(self):
+        if self.now_playing:
+            print(f"Now playing: {self.now_playing}")
+        elif self.current is not None:
+            print("Downloading the next song...")
+        entries = self.playlist.entries
+        ready = self.playlist.ready()
+        for i, entry in enumerate(entries, 1):
+            print(f"{i}. {entry}{' (downloaded)' if i <= ready else ''}")
+        if not entries and not self.now_playing:
+            print("The playlist is empty")
+        if self.searches:
+            print(f"{len(self.searches)} search(es) running")
+
+    def handle(self, command):
+        if command == 'p':
+            engine.toggle_pause()
+        elif command == 'n':
+            self.skip()
+        elif command == 'l':
+            self.show_playlist()
+        elif command == 'c':
+            # Clearing the playlist cancels its pending downloads
+            self.playlist.clear()
+            print("Playlist cleared")
+        elif command in ('?', 'h', 'help'):
+            print_help()
+        elif command.isdigit():
+            index = int(command) - 1
+            if 0 <= index < len(self.results):
+                video = self.results[index]
+                self.queue(video.get('link'))
+            else:
+                print("Please enter a valid result number!")
+        elif is_youtube_url(command):
+            self.queue(command)
+        else:
+            self.start_search(command)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._queued = asyncio.Event()
+        console = AsyncConsole()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.interrupt)
+        except NotImplementedError:
+            # Windows: no loop signal handlers, so hand the signal over from the handler
+            signal.signal(signal.SIGINT, lambda *_: loop.call_soon_threadsafe(self.interrupt))
+
+        if not self.stream:
+            engine.on_track_start = lambda source: loop.call_soon_threadsafe(self.track_changed, source)
+            engine.on_idle = lambda: loop.call_soon_threadsafe(self.track_changed, None)
+        player = asyncio.create_task(self.play_queue())
+        try:
+            while True:
+                line = await console.readline("> ")
+                if line is None:
+                    break
+                command = line.strip()
+                if command.lower() in ('q', 'quit'):
+                    break
+                if command:
+                    self.handle(command)
+        finally:
+            self.playlist.clear()
+            # The loop is about to close, so stop the engine's callbacks first
+            engine.on_track_start = engine.on_idle = None
+            for task in self.searches:
+                task.cancel()
+            self.stop()
+            player.cancel()
+            await asyncio.gather(player, *self.searches, return_exceptions=True)
+            try:
+                loop.remove_signal_handler(signal.SIGINT)
+            except NotImplementedError:
+                signal.signal(signal.SIGINT, signal.default_int_handler)
 
 def main():
+    parser = argparse.ArgumentParser(description="YouTube Music Player")
+    parser.add_argument('--stream', action='store_true',
+                        help="start playing while the audio downloads (bypasses the download cache; needs ffmpeg)")
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help="number of upcoming songs to download ahead (default: 2)")
+    args = parser.parse_args()
+
     print("YouTube Music Player")
     print("-------------------")
-    print("You can enter either a YouTube URL or a search term")
-    print("Press Ctrl+C to stop the current song")
+    print_help()
     
     # Setup YouTube with proper headers
     setup_youtube()
     
-    # Create a temporary directory for downloads
-    temp_dir = tempfile.mkdtemp()
+    # Downloads are kept between sessions in a size-bounded cache
+    cache = DownloadCache()
+    # Background downloads share keep-alive connections
+    session = HttpSession()
+    app = PlayerApp(cache, session, args.prefetch, args.stream)
     
     try:
-        while True:
-            try:
-                # Get input from user
-                query = input("\nEnter YouTube URL or search term (or 'quit' to exit): ")
-                
-                if query.lower() == 'quit':
-                    break
-                
-                # Check if input is a URL or search term
-                if 'youtube.com' in query or 'youtu.be' in query:
-                    url = query
-                else:
-                    url = search_youtube(query)
-                
-                if url:
-                    # Download and play the audio
-                    audio_file, title = download_youtube_audio(url, temp_dir)
-                    if audio_file and title:
-                        play_music(audio_file, title)
-                
-                # Ask if user wants to play another song
-                choice = input("\nDo you want to play another song? (y/n): ")
-                if choice.lower() != 'y':
-                    break
-                    
-            except KeyboardInterrupt:
-                print("\nStopping current song...")
-                continue
-                
+        asyncio.run(app.run())
     finally:
-        # Clean up: remove temporary directory and its contents
-        try:
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            print(f"Error cleaning up temporary files: {str(e)}")
+        app.playlist.close()
+        engine.shutdown()
+        session.close()
+        transcoder.shutdown()
+        normalizer.shutdown()
+        
+        stats = cache.stats()
+        print(f"\nDownload cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['bytes_saved'] / 1024 ** 2:.1f} MB saved")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,88 @@
+"""Compare the spatial-hash broad phase against brute-force collision checks.
+
+Usage:
+    python benchmarks/bench_collision.py [--counts 100 1000 10000] [--ticks 10]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pygame
+from collision import EntityManager, brute_force_collisions
+
+WORLD_WIDTH = 800
+WORLD_HEIGHT = 600
+
+
+class Box:
+    """Minimal drifting object exposing the GameObject collision interface"""
+    def __init__(self, rng: random.Random):
+        self.x = rng.uniform(0, WORLD_WIDTH)
+        self.y = rng.uniform(0, WORLD_HEIGHT)
+        self.vx = rng.uniform(-60, 60)
+        self.vy = rng.uniform(-60, 60)
+        size = rng.randint(2, 8)
+        self.rect = pygame.Rect(int(self.x), int(self.y), size, size)
+
+    def save_state(self) -> None:
+        pass
+
+    def update(self, dt: float) -> None:
+        self.x = (self.x + self.vx * dt) % WORLD_WIDTH
+        self.y = (self.y + self.vy * dt) % WORLD_HEIGHT
+
+    def get_rect(self) -> pygame.Rect:
+        self.rect.x = self.x
+        self.rect.y = self.y
+        return self.rect
+
+
+def bench(count: int, ticks: int, cell_size: int, seed: int) -> None:
+    rng = random.Random(seed)
+    boxes = [Box(rng) for _ in range(count)]
+    manager = EntityManager(WORLD_WIDTH, WORLD_HEIGHT, cell_size)
+    for box in boxes:
+        manager.add(box)
+    index = {id(box): i for i, box in enumerate(boxes)}
+
+    hash_time = 0.0
+    brute_time = 0.0
+    hits = 0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        manager.update(1 / 60)
+        found = manager.collisions()
+        hash_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = brute_force_collisions((box.rect for box in boxes), WORLD_WIDTH, WORLD_HEIGHT)
+        brute_time += time.perf_counter() - start
+
+        pairs = {tuple(sorted((index[id(a)], index[id(b)]))) for a, b in found}
+        if pairs != expected:
+            raise AssertionError(f"Spatial hash disagrees with brute force at {count} objects")
+        hits += len(pairs)
+
+    print(f"{count:>7} objects | spatial hash {hash_time / ticks * 1000:9.2f} ms/tick | "
+          f"brute force {brute_time / ticks * 1000:9.2f} ms/tick | "
+          f"speedup {brute_time / max(hash_time, 1e-9):6.1f}x | {hits // ticks} hits/tick")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spatial hash vs brute force collision benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--cell-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    for count in args.counts:
+        bench(count, args.ticks, args.cell_size, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Headless performance benchmarks for the space shooter.
+
+Every scenario runs under the SDL dummy video driver with scripted input
+and fixed seeds, and reports ticks/sec and per-tick time percentiles of
+the fastest of ``--repeat`` runs.
+Results can be saved as a baseline and later runs compared against it;
+the script exits with status 1 when a scenario is slower than the
+baseline by more than the allowed threshold. With ``--compare`` (the
+regression gate) a missing baseline, or a scenario missing from it, is
+also a failure rather than a note.
+
+Usage:
+    python benchmarks/bench_game.py [--scenarios NAME ...] [--ticks N]
+    python benchmarks/bench_game.py --save-baseline
+    python benchmarks/bench_game.py --compare --threshold 0.15
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+import pygame
+import game
+from game import BLUE, Controls, Game, ParticleSystem, ScriptedInput
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 1234
+
+
+def _seeded_game(controls: Controls, seed: int) -> Game:
+    random.seed(seed)
+    g = Game(headless=True, input_source=ScriptedInput(controls))
+    g.player.thruster_particles.rng = np.random.default_rng(seed)
+    return g
+
+
+def scenario_constant_thrust(ticks: int, seed: int) -> Callable[[], None]:
+    """Player thrusting and turning, simulated and drawn every tick"""
+    g = _seeded_game(Controls(thrust=True, left=True), seed)
+
+    def tick() -> None:
+        g.update(g.dt)
+        g.draw()
+    return tick
+
+
+def scenario_particle_explosion(ticks: int, seed: int) -> Callable[[], None]:
+    """A 10k-particle burst re-triggered whenever it has burnt out"""
+    screen = pygame.display.get_surface()
+    particles = ParticleSystem(game.SCREEN_WIDTH / 2, game.SCREEN_HEIGHT / 2, BLUE,
+                               rng=np.random.default_rng(seed))
+
+    def tick() -> None:
+        if not particles.count:
+            particles.emit(10000, 150)
+        particles.update(1 / game.TICK_RATE)
+        screen.fill(game.BLACK)
+        particles.draw(screen)
+    return tick
+
+
+def scenario_many_entities(ticks: int, seed: int) -> Callable[[], None]:
+    """Player firing continuously with 2000 long-lived bullets and collision queries"""
+    g = _seeded_game(Controls(fire=True, right=True), seed)
+    rng = random.Random(seed)
+    for _ in range(2000):
+        bullet = g.bullet_pool.acquire()
+        bullet.reset(rng.uniform(0, game.SCREEN_WIDTH), rng.uniform(0, game.SCREEN_HEIGHT),
+                     rng.uniform(-100, 100), rng.uniform(-100, 100))
+        bullet.lifetime = float('inf')
+        g.bullets.append(bullet)
+        g.entities.add(bullet, "bullets")
+
+    def tick() -> None:
+        g.update(g.dt)
+        g.entities.collisions("player", "bullets")
+        g.draw()
+    return tick
+
+
+SCENARIOS: Dict[str, Callable[[int, int], Callable[[], None]]] = {
+    "constant_thrust": scenario_constant_thrust,
+    "particle_explosion_10k": scenario_particle_explosion,
+    "many_entities": scenario_many_entities,
+}
+
+
+def run_scenario(name: str, ticks: int, warmup: int, seed: int, repeat: int = 1) -> Dict[str, float]:
+    """Run a scenario ``repeat`` times from scratch and keep the fastest run"""
+    runs = [_run_once(name, ticks, warmup, seed) for _ in range(repeat)]
+    return max(runs, key=lambda result: result["ticks_per_sec"])
+
+
+def _run_once(name: str, ticks: int, warmup: int, seed: int) -> Dict[str, float]:
+    tick = SCENARIOS[name](ticks, seed)
+    for _ in range(warmup):
+        tick()
+    times = np.empty(ticks)
+    clock = time.perf_counter
+    start = clock()
+    for i in range(ticks):
+        t0 = clock()
+        tick()
+        times[i] = clock() - t0
+    elapsed = clock() - start
+    p50, p95, p99 = np.percentile(times * 1000, (50, 95, 99))
+    return {
+        "ticks": ticks,
+        "ticks_per_sec": ticks / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(times.max() * 1000),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float, strict: bool = False) -> List[str]:
+    """Get a message for every scenario slower than its baseline beyond ``threshold``
+
+    With ``strict``, scenarios the baseline has no entry for are reported too.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            if strict:
+                regressions.append(f"{name}: no baseline entry; run with --save-baseline to add it")
+            continue
+        change = result["ticks_per_sec"] / reference["ticks_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(f"{name}: {result['ticks_per_sec']:.0f} ticks/sec is "
+                               f"{-change:.0%} below baseline {reference['ticks_per_sec']:.0f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Space shooter performance benchmarks")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the fastest is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="fail unless every scenario has a baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed fractional drop in ticks/sec before failing")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        result = run_scenario(name, args.ticks, args.warmup, args.seed, args.repeat)
+        results[name] = result
+        print(f"{name:<24} {result['ticks_per_sec']:9.0f} ticks/sec | p50 {result['p50_ms']:7.3f} ms | "
+              f"p95 {result['p95_ms']:7.3f} ms | p99 {result['p99_ms']:7.3f} ms")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        if args.compare:
+            print(f"FAILED no baseline at {args.baseline}; run with --save-baseline to create one")
+            sys.exit(1)
+        print("No baseline found; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, strict=args.compare)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import pygame
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+def _ring_overlap(a_start: int, a_end: int, b_start: int, b_end: int, size: int) -> bool:
+    """Check whether two intervals overlap on a ring of length ``size``"""
+    offset = (b_start - a_start) % size
+    return offset < a_end - a_start or size - offset < b_end - b_start
+
+
+def wrapped_colliderect(a: pygame.Rect, b: pygame.Rect, width: int, height: int) -> bool:
+    """Rect collision test on a world that wraps around at its edges"""
+    return (_ring_overlap(a.left, a.right, b.left, b.right, width)
+            and _ring_overlap(a.top, a.bottom, b.top, b.bottom, height))
+
+
+class SpatialHash:
+    """Uniform-grid spatial hash over integer keys
+
+    Each key is stored in every cell its rect touches. ``move`` only
+    re-buckets a key when the range of cells it covers changes, so objects
+    that drift within a cell cost a single tuple comparison per update.
+    With ``wrap`` enabled, cell coordinates wrap around the world edges the
+    same way the objects' positions do.
+    """
+    def __init__(self, cell_size: int, world_width: int, world_height: int, wrap: bool = True):
+        self.cell_size = cell_size
+        self.world_width = world_width
+        self.world_height = world_height
+        self.wrap = wrap
+        self.cols = -(-world_width // cell_size)
+        self.rows = -(-world_height // cell_size)
+        self.cells: Dict[int, Set[int]] = {}
+        self._spans: Dict[int, Tuple[Tuple[int, ...], Tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._spans
+
+    def _axis(self, start: int, length: int, world: int, count: int) -> Tuple[int, ...]:
+        """Get the cell indices an interval covers along one axis"""
+        size = self.cell_size
+        if not self.wrap:
+            first = max(start // size, 0)
+            last = min((start + max(length, 1) - 1) // size, count - 1)
+            return tuple(range(first, last + 1))
+        if length >= world:
+            return tuple(range(count))
+        # Wrap the interval into the world, splitting it at the far edge
+        start %= world
+        end = start + max(length, 1)
+        cells = tuple(range(start // size, (min(end, world) - 1) // size + 1))
+        if end > world:
+            cells += tuple(range(0, min((end - world - 1) // size + 1, cells[0])))
+        return cells
+
+    def _span(self, rect: pygame.Rect) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        return (self._axis(rect.left, rect.width, self.world_width, self.cols),
+                self._axis(rect.top, rect.height, self.world_height, self.rows))
+
+    def _cells(self, span: Tuple[Tuple[int, ...], Tuple[int, ...]]) -> Iterator[int]:
+        xs, ys = span
+        cols = self.cols
+        for cy in ys:
+            for cx in xs:
+                yield cy * cols + cx
+
+    def insert(self, key: int, rect: pygame.Rect) -> None:
+        """Add a key covering ``rect``"""
+        span = self._span(rect)
+        self._spans[key] = span
+        for cell in self._cells(span):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: int) -> None:
+        """Remove a key from every cell it occupies"""
+        span = self._spans.pop(key)
+        for cell in self._cells(span):
+            bucket = self.cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, key: int, rect: pygame.Rect) -> bool:
+        """Update a key's rect, returning True if it changed cells"""
+        span = self._span(rect)
+        old = self._spans.get(key)
+        if span == old:
+            return False
+        if old is not None:
+            self.remove(key)
+        self.insert(key, rect)
+        return True
+
+    def query(self, rect: pygame.Rect) -> Set[int]:
+        """Get the keys sharing at least one cell with ``rect``"""
+        found: Set[int] = set()
+        for cell in self._cells(self._span(rect)):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found |= bucket
+        return found
+
+    def neighbours(self, key: int) -> Set[int]:
+        """Get the keys sharing at least one cell with an indexed key, itself included"""
+        cells = self.cells
+        found: Set[int] = set()
+        for cell in self._cells(self._spans[key]):
+            found |= cells[cell]
+        return found
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        """Get every pair of keys that share a cell, each pair once as (low, high)"""
+        pairs: Set[Tuple[int, int]] = set()
+        for bucket in self.cells.values():
+            if len(bucket) < 2:
+                continue
+            keys = sorted(bucket)
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    pairs.add((a, b))
+        return pairs
+
+
+class EntityManager:
+    """Owns the live game objects and a spatial hash of their rects
+
+    Objects are grouped by name (for example "bullets" or "asteroids") so
+    callers can ask for collisions between specific groups only.
+    """
+    def __init__(self, world_width: int, world_height: int, cell_size: int = 64, wrap: bool = True):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.wrap = wrap
+        self.grid = SpatialHash(cell_size, world_width, world_height, wrap)
+        self.objects: Dict[int, object] = {}
+        self.groups: Dict[int, str] = {}
+        self._members: Dict[str, Dict[int, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def __iter__(self) -> Iterator[object]:
+        return iter(list(self.objects.values()))
+
+    def add(self, obj, group: str = "default") -> None:
+        """Register an object and index its current rect"""
+        key = id(obj)
+        self.objects[key] = obj
+        self.groups[key] = group
+        self._members.setdefault(group, {})[key] = None
+        self.grid.insert(key, obj.get_rect())
+
+    def remove(self, obj) -> None:
+        """Unregister an object"""
+        key = id(obj)
+        del self.objects[key]
+        del self._members[self.groups.pop(key)][key]
+        self.grid.remove(key)
+
+    def in_group(self, group: str) -> List[object]:
+        """Get the objects registered under ``group``"""
+        return [self.objects[key] for key in self._members.get(group, ())]
+
+    def refresh(self, obj) -> None:
+        """Re-index an object after it moved outside ``update``"""
+        self.grid.move(id(obj), obj.get_rect())
+
+    def update(self, dt: float) -> None:
+        """Advance every object one tick and re-index the ones that moved"""
+        move = self.grid.move
+        for key, obj in list(self.objects.items()):
+            obj.save_state()
+            obj.update(dt)
+            if key in self.objects:
+                move(key, obj.get_rect())
+
+    def draw(self, screen: pygame.Surface, alpha: float = 1.0) -> List[pygame.Rect]:
+        """Draw every object, returning the rects they painted"""
+        painted = []
+        for obj in self.objects.values():
+            rect = obj.draw(screen, alpha)
+            if rect is not None:
+                painted.append(rect)
+        return painted
+
+    def query(self, rect: pygame.Rect) -> List[object]:
+        """Get the objects whose rect overlaps ``rect``"""
+        return [self.objects[key] for key in self.grid.query(rect)
+                if self.colliderect(rect, self.objects[key].rect)]
+
+    def colliderect(self, a: pygame.Rect, b: pygame.Rect) -> bool:
+        """Rect test that honours the world's wrapping"""
+        if self.wrap:
+            return wrapped_colliderect(a, b, self.world_width, self.world_height)
+        return a.colliderect(b)
+
+    def candidate_pairs(self, group_a: Optional[str] = None,
+                        group_b: Optional[str] = None) -> List[Tuple[object, object]]:
+        """Get broad-phase pairs of objects sharing a grid cell
+
+        When groups are given, each pair is returned as (member of
+        ``group_a``, member of ``group_b``), and only the cells around the
+        members of the smaller named group are searched, so one player
+        against thousands of bullets costs a handful of cell lookups.
+        """
+        objects, groups = self.objects, self.groups
+        if group_a is None and group_b is None:
+            return [(objects[a], objects[b]) for a, b in self.grid.candidate_pairs()]
+
+        members = self._members
+        swap = group_a is None or (group_b is not None and
+                                   len(members.get(group_b, ())) < len(members.get(group_a, ())))
+        probe, other = (group_b, group_a) if swap else (group_a, group_b)
+        # Pairs within one group would otherwise be found from both ends
+        seen: Optional[Set[Tuple[int, int]]] = set() if other is None or other == probe else None
+        neighbours = self.grid.neighbours
+        pairs = []
+        for key in members.get(probe, ()):
+            for near in neighbours(key):
+                if near == key or (other is not None and groups[near] != other):
+                    continue
+                if seen is not None:
+                    pair = (key, near) if key < near else (near, key)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                pairs.append((objects[near], objects[key]) if swap else (objects[key], objects[near]))
+        return pairs
+
+    def collisions(self, group_a: Optional[str] = None,
+                   group_b: Optional[str] = None) -> List[Tuple[object, object]]:
+        """Get the candidate pairs whose rects actually overlap"""
+        return [(a, b) for a, b in self.candidate_pairs(group_a, group_b)
+                if self.colliderect(a.rect, b.rect)]
+
+
+def brute_force_collisions(rects: Iterable[pygame.Rect], world_width: int,
+                           world_height: int, wrap: bool = True) -> Set[Tuple[int, int]]:
+    """All-pairs reference collision check, returning index pairs (low, high)"""
+    rects = list(rects)
+    pairs: Set[Tuple[int, int]] = set()
+    for i, rect in enumerate(rects):
+        shifted = [rect]
+        if wrap:
+            for dx in (0, -world_width) if rect.right > world_width else (0,):
+                for dy in (0, -world_height) if rect.bottom > world_height else (0,):
+                    if dx or dy:
+                        shifted.append(rect.move(dx, dy))
+        for probe in shifted:
+            for j in probe.collidelistall(rects):
+                if j != i:
+                    pairs.add((min(i, j), max(i, j)))
+    return pairs
@@ -1,10 +1,17 @@
+import os
+import time
+import argparse
 import pygame
 import sys
-import random
 import math
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Tuple, Optional, Sequence, Union
 from abc import ABC, abstractmethod
+from collision import EntityManager
+from pool import ObjectPool
+from render import DirtyRectRenderer
+from profiler import ProfilerOverlay, frame_profiler
+from parallel import SharedBlock, SimulationPool, integrate_particles
 
 # Initialize Pygame
 pygame.init()
@@ -13,6 +20,12 @@ pygame.init()
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
+TICK_RATE = 60  # Fixed simulation steps per second
+MAX_FRAME_TIME = 0.25  # Longest wall-clock frame the simulation catches up on
+BULLET_POOL_SIZE = 64
+# Particles per worker before integration is split across processes; the
+# thruster keeps a few hundred alive, so this is what lets --workers engage
+PARTICLE_MIN_SHARD = 64
 
 # Colors
 WHITE = (255, 255, 255)
@@ -21,8 +34,97 @@ RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 
+class Controls(NamedTuple):
+    """Player control state for a single simulation tick"""
+    left: bool = False
+    right: bool = False
+    thrust: bool = False
+    fire: bool = False
+
+
+class InputSource(ABC):
+    """Supplies the controls a Player reads each tick"""
+    @abstractmethod
+    def get_controls(self) -> Controls:
+        """Get the control state for the current tick"""
+        pass
+
+
+class KeyboardInput(InputSource):
+    """Reads controls from the arrow keys"""
+    def get_controls(self) -> Controls:
+        keys = pygame.key.get_pressed()
+        return Controls(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_UP],
+                        keys[pygame.K_SPACE])
+
+
+class ScriptedInput(InputSource):
+    """Replays controls without a keyboard, for bots, soak tests and benchmarks
+
+    ``script`` is either a fixed Controls value, a sequence of Controls that
+    is replayed in a loop, or a callable mapping the tick number to Controls.
+    """
+    def __init__(self, script: Union[Controls, Sequence[Controls], Callable[[int], Controls]]):
+        self.script = script
+        self.tick = 0
+
+    def get_controls(self) -> Controls:
+        tick = self.tick
+        self.tick += 1
+        if isinstance(self.script, Controls):
+            return self.script
+        if callable(self.script):
+            return self.script(tick)
+        return self.script[tick % len(self.script)]
+
+
+def wrapped_lerp(start: float, end: float, alpha: float, size: float) -> float:
+    """Interpolate a coordinate that wraps around at ``size``"""
+    delta = end - start
+    if abs(delta) > size / 2:
+        delta -= math.copysign(size, delta)
+    return (start + delta * alpha) % size
+
+
+class RotationCache:
+    """Rotated copies of a static sprite, quantized to a fixed angle step
+
+    Rotations are rendered lazily on first use (or all at once with
+    ``build_all``) and reused for the lifetime of the cache.
+    """
+    def __init__(self, surface: pygame.Surface, step: float = 2.0):
+        if step <= 0:
+            raise ValueError("Rotation step must be positive")
+        self.surface = surface
+        self.slots = max(1, round(360 / step))
+        self.step = 360 / self.slots
+        self._rotations: List[Optional[pygame.Surface]] = [None] * self.slots
+
+    def __len__(self) -> int:
+        return sum(rotation is not None for rotation in self._rotations)
+
+    def get(self, angle: float) -> pygame.Surface:
+        """Get the sprite rotated counter-clockwise by roughly ``angle`` degrees"""
+        index = round((angle % 360) / self.step) % self.slots
+        rotated = self._rotations[index]
+        if rotated is None:
+            rotated = pygame.transform.rotate(self.surface, index * self.step)
+            if pygame.display.get_surface() is not None:
+                rotated = rotated.convert_alpha()
+            self._rotations[index] = rotated
+        return rotated
+
+    def build_all(self) -> None:
+        """Render every rotation up front"""
+        for index in range(self.slots):
+            self.get(index * self.step)
+
+
 class GameObject(ABC):
     """Abstract base class for all game objects"""
+    ROTATION_STEP = 2.0
+    _sprite_caches: Dict[Tuple[type, int, int], RotationCache] = {}
+
     def __init__(self, x: float, y: float, width: int, height: int):
         self.x = x
         self.y = y
@@ -30,6 +132,8 @@ class GameObject(ABC):
         self.height = height
         self.rect = pygame.Rect(x, y, width, height)
         self.velocity = pygame.math.Vector2(0, 0)
+        self.prev_x = x
+        self.prev_y = y
         
     @abstractmethod
     def update(self, dt: float) -> None:
@@ -37,9 +141,24 @@ class GameObject(ABC):
         pass
         
     @abstractmethod
-    def draw(self, screen: pygame.Surface) -> None:
-        """Draw object on screen"""
+    def draw(self, screen: pygame.Surface, alpha: float = 1.0) -> Optional[pygame.Rect]:
+        """Draw object on screen, ``alpha`` of the way from the previous tick
+
+        Returns the bounding rect of everything painted, or None.
+        """
         pass
+
+    def save_state(self) -> None:
+        """Remember the current state as the start point for render interpolation"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def interpolated_position(self, alpha: float) -> Tuple[float, float]:
+        """Get the position ``alpha`` of the way from the previous tick to now"""
+        if alpha >= 1.0:
+            return self.x, self.y
+        return (wrapped_lerp(self.prev_x, self.x, alpha, SCREEN_WIDTH),
+                wrapped_lerp(self.prev_y, self.y, alpha, SCREEN_HEIGHT))
         
     def get_rect(self) -> pygame.Rect:
         """Get current rectangle for collision detection"""
@@ -47,65 +166,297 @@ class GameObject(ABC):
         self.rect.y = self.y
         return self.rect
 
+    def render_sprite(self) -> pygame.Surface:
+        """Render the unrotated shape of objects whose look never changes"""
+        raise NotImplementedError(f"{type(self).__name__} has no static sprite")
+
+    def sprite_cache(self) -> RotationCache:
+        """Get the rotation cache shared by all objects of this type and size"""
+        key = (type(self), self.width, self.height)
+        cache = GameObject._sprite_caches.get(key)
+        if cache is None:
+            cache = RotationCache(self.render_sprite(), self.ROTATION_STEP)
+            GameObject._sprite_caches[key] = cache
+        return cache
+
+    def draw_rotated(self, screen: pygame.Surface, rotation: float,
+                     position: Optional[Tuple[float, float]] = None) -> pygame.Rect:
+        """Blit the cached sprite rotated about the object's center"""
+        x, y = position if position is not None else (self.x, self.y)
+        rotated = self.sprite_cache().get(rotation)
+        rect = rotated.get_rect(center=(x + self.width/2, y + self.height/2))
+        return screen.blit(rotated, rect)
+
+class CompactObject(ABC):
+    """Lightweight ``__slots__`` counterpart of GameObject for high-volume entities
+
+    Instances have no per-instance dict and keep their velocity as plain
+    floats, so they are cheap to preallocate in an ObjectPool. ``reset``
+    re-arms a recycled instance in place instead of constructing a new one.
+    """
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'width', 'height', 'rect', 'alive')
+
+    def __init__(self, width: int, height: int):
+        self.x = self.y = self.prev_x = self.prev_y = 0.0
+        self.vx = self.vy = 0.0
+        self.width = width
+        self.height = height
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.alive = False
+
+    def reset(self, x: float, y: float, vx: float, vy: float) -> None:
+        """Place a recycled object back into the world"""
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.vx = vx
+        self.vy = vy
+        self.alive = True
+
+    def update(self, dt: float) -> None:
+        """Move with constant velocity, wrapping at the screen edges"""
+        self.x = (self.x + self.vx * dt) % SCREEN_WIDTH
+        self.y = (self.y + self.vy * dt) % SCREEN_HEIGHT
+
+    @abstractmethod
+    def draw(self, screen: pygame.Surface, alpha: float = 1.0) -> Optional[pygame.Rect]:
+        """Draw object on screen, returning the rect painted"""
+        pass
+
+    save_state = GameObject.save_state
+    interpolated_position = GameObject.interpolated_position
+    get_rect = GameObject.get_rect
+
+
+class Bullet(CompactObject):
+    """Short-lived projectile fired by the player"""
+    __slots__ = ('lifetime',)
+    SPEED = 500
+    LIFETIME = 1.0
+    SIZE = 4
+
+    def __init__(self):
+        super().__init__(self.SIZE, self.SIZE)
+        self.lifetime = 0.0
+
+    def fire(self, x: float, y: float, rotation: float, velocity: pygame.math.Vector2) -> None:
+        """Launch from a point in the direction of ``rotation`` degrees"""
+        angle_rad = math.radians(rotation)
+        self.reset(x - self.SIZE / 2, y - self.SIZE / 2,
+                   velocity.x + math.cos(angle_rad) * self.SPEED,
+                   velocity.y - math.sin(angle_rad) * self.SPEED)
+        self.lifetime = self.LIFETIME
+
+    def update(self, dt: float) -> None:
+        super().update(dt)
+        self.lifetime -= dt
+        if self.lifetime <= 0:
+            self.alive = False
+
+    def draw(self, screen: pygame.Surface, alpha: float = 1.0) -> Optional[pygame.Rect]:
+        x, y = self.interpolated_position(alpha)
+        return screen.fill(YELLOW, (int(x), int(y), self.width, self.height))
+
+
 class ParticleSystem:
-    """Handles particle effects for explosions and thrusters"""
-    def __init__(self, x: float, y: float, color: Tuple[int, int, int]):
-        self.particles: List[dict] = []
+    """Handles particle effects for explosions and thrusters
+
+    Particles are kept in a preallocated structure-of-arrays store: one
+    NumPy row per field (x, y, vx, vy, lifetime) with the live particles
+    packed into the first ``count`` columns. Emission, integration and
+    removal of dead particles all run as vectorized batch operations.
+
+    Rendering uses a small atlas of pre-rendered sprites, one per alpha
+    level, shared by every system of the same color. Each particle picks
+    its sprite from its remaining lifetime and the whole batch is submitted
+    with a single ``Surface.blits`` call.
+    """
+    FIELDS = ('x', 'y', 'vx', 'vy', 'lifetime')
+    MAX_LIFETIME = 1.5
+    RADIUS = 2
+    ALPHA_LEVELS = 16
+    _atlas_cache: Dict[Tuple[int, int, int], List[pygame.Surface]] = {}
+
+    def __init__(self, x: float, y: float, color: Tuple[int, int, int],
+                 capacity: int = 256, rng: Optional[np.random.Generator] = None):
         self.x = x
         self.y = y
         self.color = color
-        
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        self._data = self._allocate(max(1, capacity))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        """Number of particles that fit before the store has to grow"""
+        return self._data.shape[1]
+
+    @property
+    def positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Views of the x and y coordinates of the live particles"""
+        return self._data[0, :self.count], self._data[1, :self.count]
+
+    @property
+    def lifetimes(self) -> np.ndarray:
+        """View of the remaining lifetime of the live particles"""
+        return self._data[4, :self.count]
+
+    def _reserve(self, needed: int) -> None:
+        """Grow the store geometrically so that ``needed`` particles fit"""
+        if needed <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        old = self._data
+        self._data = self._allocate(new_capacity)
+        self._data[:, :self.count] = old[:, :self.count]
+        self._free(old)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """Create a zeroed store for ``capacity`` particles"""
+        return np.zeros((len(self.FIELDS), capacity), dtype=np.float64)
+
+    def _free(self, data: np.ndarray) -> None:
+        """Release a store that has been replaced"""
+        pass
+
+    def _integrate(self, count: int, dt: float) -> None:
+        """Advance the first ``count`` particles by ``dt``"""
+        integrate_particles(self._data[:, :count], dt)
+
     def emit(self, count: int, speed: float) -> None:
         """Emit new particles"""
-        for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed_var = random.uniform(0.5, 1.5) * speed
-            self.particles.append({
-                'x': self.x,
-                'y': self.y,
-                'vx': math.cos(angle) * speed_var,
-                'vy': math.sin(angle) * speed_var,
-                'lifetime': random.uniform(0.5, 1.5)
-            })
-            
+        if count <= 0:
+            return
+        start = self.count
+        end = start + count
+        self._reserve(end)
+
+        angle = self.rng.uniform(0, 2 * math.pi, count)
+        speed_var = self.rng.uniform(0.5, 1.5, count) * speed
+        batch = self._data[:, start:end]
+        batch[0] = self.x
+        batch[1] = self.y
+        batch[2] = np.cos(angle) * speed_var
+        batch[3] = np.sin(angle) * speed_var
+        batch[4] = self.rng.uniform(0.5, self.MAX_LIFETIME, count)
+        self.count = end
+
     def update(self, dt: float) -> None:
         """Update particle positions and lifetimes"""
-        for particle in self.particles[:]:
-            particle['x'] += particle['vx'] * dt
-            particle['y'] += particle['vy'] * dt
-            particle['lifetime'] -= dt
-            if particle['lifetime'] <= 0:
-                self.particles.remove(particle)
-                
-    def draw(self, screen: pygame.Surface) -> None:
-        """Draw all particles"""
-        for particle in self.particles:
-            alpha = int(255 * (particle['lifetime'] / 1.5))
-            color = (*self.color, alpha)
-            pos = (int(particle['x']), int(particle['y']))
-            pygame.draw.circle(screen, color, pos, 2)
+        n = self.count
+        if n == 0:
+            return
+        self._integrate(n, dt)
+        live = self._data[:, :n]
+
+        # Compact survivors to the front of the store in one gather
+        alive = live[4] > 0
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            self._data[:, :keep.size] = live[:, keep]
+            self.count = keep.size
+
+    def clear(self) -> None:
+        """Remove all particles without releasing the store"""
+        self.count = 0
+
+    @classmethod
+    def sprite_atlas(cls, color: Tuple[int, int, int]) -> List[pygame.Surface]:
+        """Get the alpha-faded sprites for a color, faintest first"""
+        atlas = cls._atlas_cache.get(color)
+        if atlas is None:
+            size = cls.RADIUS * 2 + 1
+            atlas = []
+            for level in range(cls.ALPHA_LEVELS):
+                alpha = 255 * (level + 1) // cls.ALPHA_LEVELS
+                sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                pygame.draw.circle(sprite, (*color, alpha), (cls.RADIUS, cls.RADIUS), cls.RADIUS)
+                if pygame.display.get_surface() is not None:
+                    sprite = sprite.convert_alpha()
+                atlas.append(sprite)
+            cls._atlas_cache[color] = atlas
+        return atlas
+
+    def draw(self, screen: pygame.Surface) -> Optional[pygame.Rect]:
+        """Draw all particles, returning their bounding rect"""
+        if self.count == 0:
+            return None
+        atlas = self.sprite_atlas(self.color)
+        xs, ys = self.positions
+        levels = (self.lifetimes * (self.ALPHA_LEVELS / self.MAX_LIFETIME)).astype(np.intp)
+        np.clip(levels, 0, self.ALPHA_LEVELS - 1, out=levels)
+        corners = zip((xs - self.RADIUS).astype(np.int32).tolist(),
+                      (ys - self.RADIUS).astype(np.int32).tolist())
+        sprites = map(atlas.__getitem__, levels.tolist())
+        screen.blits(zip(sprites, corners), doreturn=False)
+
+        size = self.RADIUS * 2 + 1
+        left = int(xs.min()) - self.RADIUS
+        top = int(ys.min()) - self.RADIUS
+        return pygame.Rect(left, top, int(xs.max()) - self.RADIUS - left + size,
+                           int(ys.max()) - self.RADIUS - top + size)
+
+class SharedParticleSystem(ParticleSystem):
+    """ParticleSystem whose store lives in shared memory
+
+    Integration is sharded across the worker processes of a SimulationPool;
+    emission, compaction and drawing stay in the main process. Results are
+    identical to the single-process ParticleSystem.
+    """
+    def __init__(self, x: float, y: float, color: Tuple[int, int, int], pool: SimulationPool,
+                 capacity: int = 256, rng: Optional[np.random.Generator] = None):
+        self.pool = pool
+        self._blocks: Dict[int, SharedBlock] = {}
+        super().__init__(x, y, color, capacity, rng)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        block = self.pool.allocate((len(self.FIELDS), capacity))
+        self._blocks[id(block.array)] = block
+        return block.array
+
+    def _free(self, data: np.ndarray) -> None:
+        self.pool.release(self._blocks.pop(id(data)))
+
+    def _integrate(self, count: int, dt: float) -> None:
+        block = self._blocks[id(self._data)]
+        self.pool.step([('particles', block, count, dt, ())])
+
 
 class Player(GameObject):
     """Player spaceship class"""
-    def __init__(self, x: float, y: float):
+    SHOT_COOLDOWN = 0.15
+    def __init__(self, x: float, y: float, input_source: Optional[InputSource] = None,
+                 thruster_particles: Optional[ParticleSystem] = None):
         super().__init__(x, y, 40, 40)
         self.thrust = 300
         self.rotation = 0
+        self.prev_rotation = 0
         self.shooting_cooldown = 0
-        self.thruster_particles = ParticleSystem(x, y, BLUE)
+        self.fire_requested = False
+        self.thruster_particles = (thruster_particles if thruster_particles is not None
+                                   else ParticleSystem(x, y, BLUE))
+        self.input_source = input_source if input_source is not None else KeyboardInput()
+
+    def save_state(self) -> None:
+        super().save_state()
+        self.prev_rotation = self.rotation
         
     def update(self, dt: float) -> None:
         # Handle input
-        keys = pygame.key.get_pressed()
+        controls = self.input_source.get_controls()
         
         # Rotation
-        if keys[pygame.K_LEFT]:
+        if controls.left:
             self.rotation -= 180 * dt
-        if keys[pygame.K_RIGHT]:
+        if controls.right:
             self.rotation += 180 * dt
             
         # Movement
-        if keys[pygame.K_UP]:
+        if controls.thrust:
             angle_rad = math.radians(self.rotation)
             self.velocity.x += math.cos(angle_rad) * self.thrust * dt
             self.velocity.y -= math.sin(angle_rad) * self.thrust * dt
@@ -126,17 +477,30 @@ class Player(GameObject):
         # Update thruster particles
         self.thruster_particles.x = self.x + self.width/2
         self.thruster_particles.y = self.y + self.height/2
-        self.thruster_particles.update(dt)
+        with frame_profiler.measure('particles.update'):
+            self.thruster_particles.update(dt)
         
+        # Shooting is carried out by the Game, which owns the bullet pool
+        if controls.fire and self.shooting_cooldown <= 0:
+            self.fire_requested = True
+            self.shooting_cooldown = self.SHOT_COOLDOWN
+
         # Update shooting cooldown
         if self.shooting_cooldown > 0:
             self.shooting_cooldown -= dt
             
-    def draw(self, screen: pygame.Surface) -> None:
+    def draw(self, screen: pygame.Surface, alpha: float = 1.0) -> Optional[pygame.Rect]:
         # Draw thruster particles
-        self.thruster_particles.draw(screen)
+        with frame_profiler.measure('particles.draw'):
+            particles_rect = self.thruster_particles.draw(screen)
         
         # Draw ship
+        with frame_profiler.measure('player.draw'):
+            rotation = self.prev_rotation + (self.rotation - self.prev_rotation) * alpha
+            ship_rect = self.draw_rotated(screen, rotation, self.interpolated_position(alpha))
+        return ship_rect.union(particles_rect) if particles_rect else ship_rect
+
+    def render_sprite(self) -> pygame.Surface:
         surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
         points = [
             (self.width/2, 0),
@@ -145,19 +509,51 @@ class Player(GameObject):
             (self.width, self.height)
         ]
         pygame.draw.polygon(surface, WHITE, points)
-        
-        # Rotate ship
-        rotated = pygame.transform.rotate(surface, self.rotation)
-        rect = rotated.get_rect(center=(self.x + self.width/2, self.y + self.height/2))
-        screen.blit(rotated, rect)
+        return surface
 
 class Game:
-    """Main game class"""
-    def __init__(self):
+    """Main game class
+
+    The simulation advances in fixed steps of ``1 / tick_rate`` seconds,
+    independent of the render rate; frames are drawn interpolated between
+    the last two ticks. In headless mode SDL uses its dummy video driver,
+    nothing is drawn and ``simulate`` runs ticks as fast as the CPU allows.
+    With ``dirty_rects`` enabled, frames are presented through a
+    DirtyRectRenderer instead of a full clear and flip. With ``profile``
+    enabled, per-phase timings are collected by ``frame_profiler``; F3
+    toggles the on-screen readout either way. With ``workers`` > 0, particle
+    state is kept in shared memory and integrated by a SimulationPool of
+    that many processes, while input and rendering stay in this process.
+    """
+    def __init__(self, headless: bool = False, input_source: Optional[InputSource] = None,
+                 tick_rate: int = TICK_RATE, dirty_rects: bool = False, profile: bool = False,
+                 workers: int = 0):
+        self.headless = headless
+        self.profile = profile
+        self.profiler = frame_profiler
+        self.profiler.enabled = profile
+        self.overlay = ProfilerOverlay(self.profiler)
+        self.show_overlay = False
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            if pygame.display.get_init() and pygame.display.get_driver() != 'dummy':
+                pygame.display.quit()
+            pygame.display.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Space Shooter")
+        self.renderer = DirtyRectRenderer(self.screen, BLACK) if dirty_rects else None
         self.clock = pygame.time.Clock()
-        self.player = Player(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)
+        self.dt = 1.0 / tick_rate
+        self.tick = 0
+        self.entities = EntityManager(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.sim_pool = SimulationPool(workers, PARTICLE_MIN_SHARD) if workers > 0 else None
+        thruster_particles = None
+        if self.sim_pool is not None:
+            thruster_particles = SharedParticleSystem(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, BLUE, self.sim_pool)
+        self.player = Player(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, input_source, thruster_particles)
+        self.entities.add(self.player, "player")
+        self.bullet_pool = ObjectPool(Bullet, BULLET_POOL_SIZE)
+        self.bullets: List[Bullet] = []
         self.running = True
         
     def handle_events(self) -> None:
@@ -168,28 +564,159 @@ class Game:
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     self.running = False
+                elif event.key == pygame.K_F3:
+                    self.toggle_overlay()
+
+    def toggle_overlay(self) -> None:
+        """Show or hide the profiler readout, profiling while it is shown"""
+        self.show_overlay = not self.show_overlay
+        self.profiler.enabled = self.profile or self.show_overlay
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
+    def record_counts(self) -> None:
+        """Report entity gauges to the profiler"""
+        self.profiler.count('entities', len(self.entities))
+        self.profiler.count('particles', len(self.player.thruster_particles))
+        self.profiler.count('bullets', len(self.bullets))
                     
     def update(self, dt: float) -> None:
         """Update game state"""
-        self.player.update(dt)
+        self.entities.update(dt)
+        if self.player.fire_requested:
+            self.player.fire_requested = False
+            self.fire_bullet()
+        self.reap_bullets()
+        self.tick += 1
+
+    def fire_bullet(self) -> None:
+        """Launch a pooled bullet from the player's nose"""
+        player = self.player
+        angle_rad = math.radians(player.rotation)
+        bullet = self.bullet_pool.acquire()
+        bullet.fire(player.x + player.width/2 + math.cos(angle_rad) * player.width/2,
+                    player.y + player.height/2 - math.sin(angle_rad) * player.height/2,
+                    player.rotation, player.velocity)
+        self.bullets.append(bullet)
+        self.entities.add(bullet, "bullets")
+
+    def reap_bullets(self) -> None:
+        """Return expired bullets to the pool, compacting the list in place"""
+        bullets = self.bullets
+        live = 0
+        for bullet in bullets:
+            if bullet.alive:
+                bullets[live] = bullet
+                live += 1
+            else:
+                self.entities.remove(bullet)
+                self.bullet_pool.release(bullet)
+        del bullets[live:]
         
-    def draw(self) -> None:
+    def draw(self, alpha: float = 1.0) -> None:
         """Draw game state"""
-        self.screen.fill(BLACK)
-        self.player.draw(self.screen)
-        pygame.display.flip()
+        if self.renderer is None:
+            self.screen.fill(BLACK)
+            self.entities.draw(self.screen, alpha)
+            if self.show_overlay:
+                self.overlay.draw(self.screen)
+            pygame.display.flip()
+            return
+
+        self.renderer.begin_frame()
+        for rect in self.entities.draw(self.screen, alpha):
+            self.renderer.add(rect)
+        if self.show_overlay:
+            self.renderer.add(self.overlay.draw(self.screen))
+        self.renderer.present()
+
+    def close(self) -> None:
+        """Shut down worker processes and free shared memory"""
+        if self.sim_pool is not None:
+            self.sim_pool.close()
+            self.sim_pool = None
+
+    def simulate(self, ticks: int) -> float:
+        """Advance the simulation ``ticks`` fixed steps without rendering
+
+        Returns the wall-clock time taken, in seconds.
+        """
+        profiler = self.profiler
+        start = time.perf_counter()
+        for _ in range(ticks):
+            if not self.running:
+                break
+            profiler.begin_frame()
+            with profiler.measure('update'):
+                self.update(self.dt)
+            if profiler.enabled:
+                self.record_counts()
+            profiler.end_frame()
+        return time.perf_counter() - start
         
-    def run(self) -> None:
-        """Main game loop"""
+    def run(self, profile_path: Optional[str] = None) -> None:
+        """Main game loop
+
+        If ``profile_path`` is given, profiler samples are written there
+        (CSV, or JSON for a ``.json`` path) when the loop exits.
+        """
+        profiler = self.profiler
+        accumulator = 0.0
+        previous = time.perf_counter()
         while self.running:
-            dt = self.clock.tick(FPS) / 1000.0
-            self.handle_events()
-            self.update(dt)
-            self.draw()
-            
+            self.clock.tick(FPS)
+            profiler.begin_frame()
+            now = time.perf_counter()
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+
+            with profiler.measure('events'):
+                self.handle_events()
+            with profiler.measure('update'):
+                while accumulator >= self.dt:
+                    self.update(self.dt)
+                    accumulator -= self.dt
+            if not self.headless:
+                with profiler.measure('draw'):
+                    self.draw(accumulator / self.dt)
+            if profiler.enabled:
+                self.record_counts()
+            profiler.end_frame()
+
+        if profile_path:
+            profiler.dump(profile_path)
+        self.close()
         pygame.quit()
         sys.exit()
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Space Shooter")
+    parser.add_argument('--headless', action='store_true',
+                        help="run without a display using scripted input")
+    parser.add_argument('--ticks', type=int, default=3600,
+                        help="number of ticks to simulate in headless mode")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="only redraw the parts of the screen that changed")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="number of worker processes for the particle simulation")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="collect frame timings and write them to PATH (.csv or .json) on exit")
+    args = parser.parse_args()
+
+    if args.headless:
+        game = Game(headless=True, profile=bool(args.profile), workers=args.workers,
+                    input_source=ScriptedInput(Controls(thrust=True, left=True, fire=True)))
+        elapsed = game.simulate(args.ticks)
+        print(f"Simulated {game.tick} ticks in {elapsed:.3f}s "
+              f"({game.tick / max(elapsed, 1e-9):.0f} ticks/sec)")
+        print(f"Bullet pool: {game.bullet_pool.stats()}")
+        if args.profile:
+            game.profiler.dump(args.profile)
+        game.close()
+        pygame.quit()
+    else:
+        game = Game(dirty_rects=args.dirty_rects, profile=bool(args.profile), workers=args.workers)
+        game.run(args.profile)
+
 if __name__ == "__main__":
-    game = Game()
-    game.run() 
\ No newline at end of file
+    main()
@@ -0,0 +1,74 @@
+from typing import Callable, Dict, Generic, List, Set, TypeVar
+
+T = TypeVar('T')
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when a fixed-size pool has no free slots"""
+
+
+class ObjectPool(Generic[T]):
+    """Preallocated pool of reusable objects with acquire/release semantics
+
+    Every slot is created up front by ``factory``. ``acquire`` hands out a
+    free slot and ``release`` returns it, so steady-state gameplay never
+    allocates new objects. When the pool runs dry it either grows by
+    ``capacity`` more slots (counted in ``stats()['grown']``, a hint to size
+    the pool bigger) or, with ``growable=False``, raises PoolExhausted.
+    """
+    def __init__(self, factory: Callable[[], T], capacity: int, growable: bool = True):
+        if capacity <= 0:
+            raise ValueError("Pool capacity must be positive")
+        self.factory = factory
+        self.growable = growable
+        self._chunk = capacity
+        self._free: List[T] = [factory() for _ in range(capacity)]
+        self._in_use: Set[int] = set()
+        self.capacity = capacity
+        self.peak = 0
+        self.acquired = 0
+        self.released = 0
+        self.grown = 0
+
+    def __len__(self) -> int:
+        """Number of objects currently handed out"""
+        return len(self._in_use)
+
+    def _grow(self) -> None:
+        if not self.growable:
+            raise PoolExhausted(f"Pool of {self.capacity} objects is exhausted")
+        self._free.extend(self.factory() for _ in range(self._chunk))
+        self.capacity += self._chunk
+        self.grown += 1
+
+    def acquire(self) -> T:
+        """Take a free object out of the pool"""
+        if not self._free:
+            self._grow()
+        obj = self._free.pop()
+        self._in_use.add(id(obj))
+        self.acquired += 1
+        if len(self._in_use) > self.peak:
+            self.peak = len(self._in_use)
+        return obj
+
+    def release(self, obj: T) -> None:
+        """Return an object to the pool"""
+        key = id(obj)
+        if key not in self._in_use:
+            raise ValueError("Object was not acquired from this pool")
+        self._in_use.remove(key)
+        self._free.append(obj)
+        self.released += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Occupancy counters for sizing the pool"""
+        return {
+            'capacity': self.capacity,
+            'in_use': len(self._in_use),
+            'free': len(self._free),
+            'peak': self.peak,
+            'acquired': self.acquired,
+            'released': self.released,
+            'grown': self.grown,
+        }
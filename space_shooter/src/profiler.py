@@ -0,0 +1,193 @@
+import csv
+import json
+import time
+import contextlib
+import numpy as np
+import pygame
+from typing import ContextManager, Dict, List, Optional
+
+
+class _PhaseTimer:
+    """Reusable context manager adding elapsed time to one phase"""
+    __slots__ = ('current', 'name', 'start')
+
+    def __init__(self, current: Dict[str, float], name: str):
+        self.current = current
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.current[self.name] += time.perf_counter() - self.start
+
+
+_DISABLED = contextlib.nullcontext()
+
+
+class FrameProfiler:
+    """Per-phase frame timings kept in a fixed-size ring buffer
+
+    Each frame is bracketed by ``begin_frame``/``end_frame``; code inside it
+    times itself with ``with profiler.measure("phase"):`` and reports gauges
+    such as entity counts with ``count``. Every phase and counter keeps the
+    last ``capacity`` frames. ``frame`` is the wall time between consecutive
+    frames and ``busy`` the time spent between begin and end.
+
+    While disabled, ``measure`` returns a shared no-op context manager and
+    the other hooks return immediately, so instrumentation can stay in place.
+    """
+    def __init__(self, capacity: int = 600, enabled: bool = False):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.frames = 0
+        self.timings: Dict[str, np.ndarray] = {}
+        self.counters: Dict[str, np.ndarray] = {}
+        self._current: Dict[str, float] = {}
+        self._counts: Dict[str, float] = {}
+        self._timers: Dict[str, _PhaseTimer] = {}
+        self._frame_start = 0.0
+        self._last_frame_start: Optional[float] = None
+
+    def _series(self, store: Dict[str, np.ndarray], name: str) -> np.ndarray:
+        series = store.get(name)
+        if series is None:
+            series = store[name] = np.zeros(self.capacity)
+        return series
+
+    def measure(self, phase: str) -> ContextManager[None]:
+        """Context manager timing a block as part of ``phase``"""
+        if not self.enabled:
+            return _DISABLED
+        timer = self._timers.get(phase)
+        if timer is None:
+            self._current.setdefault(phase, 0.0)
+            timer = self._timers[phase] = _PhaseTimer(self._current, phase)
+        return timer
+
+    def count(self, name: str, value: float) -> None:
+        """Record a gauge value, such as an entity count, for this frame"""
+        if self.enabled:
+            self._counts[name] = value
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._frame_start = time.perf_counter()
+        for phase in self._current:
+            self._current[phase] = 0.0
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        slot = self.frames % self.capacity
+        start = self._frame_start
+        previous = self._last_frame_start
+        self._series(self.timings, 'frame')[slot] = start - previous if previous is not None else now - start
+        self._series(self.timings, 'busy')[slot] = now - start
+        for phase, elapsed in self._current.items():
+            self._series(self.timings, phase)[slot] = elapsed
+        for name, value in self._counts.items():
+            self._series(self.counters, name)[slot] = value
+        self._last_frame_start = start
+        self.frames += 1
+
+    def reset(self) -> None:
+        """Drop all recorded samples"""
+        self.frames = 0
+        self.timings.clear()
+        self.counters.clear()
+        self._counts.clear()
+        self._last_frame_start = None
+
+    def _ordered(self, series: np.ndarray) -> np.ndarray:
+        """Samples of one series, oldest first"""
+        if self.frames <= self.capacity:
+            return series[:self.frames]
+        slot = self.frames % self.capacity
+        return np.concatenate((series[slot:], series[:slot]))
+
+    def samples(self) -> Dict[str, np.ndarray]:
+        """Recorded timings (seconds) and counters, oldest frame first"""
+        result = {name: self._ordered(series) for name, series in self.timings.items()}
+        result.update((name, self._ordered(series)) for name, series in self.counters.items())
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean, p50, p99 and max per phase in milliseconds, and last counter values"""
+        result: Dict[str, Dict[str, float]] = {}
+        if self.frames == 0:
+            return result
+        for name, series in self.timings.items():
+            values = self._ordered(series) * 1000
+            p50, p99 = np.percentile(values, (50, 99))
+            result[name] = {'mean': float(values.mean()), 'p50': float(p50),
+                            'p99': float(p99), 'max': float(values.max())}
+        last = (self.frames - 1) % self.capacity
+        for name, series in self.counters.items():
+            result[name] = {'last': float(series[last])}
+        return result
+
+    def dump(self, path: str) -> None:
+        """Write samples to ``path`` as JSON (``.json``) or CSV (anything else)"""
+        samples = self.samples()
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(),
+                           'samples': {name: values.tolist() for name, values in samples.items()}},
+                          f, indent=2)
+            return
+        names = list(samples)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + [name + '_ms' if name in self.timings else name
+                                         for name in names])
+            first = max(self.frames - self.capacity, 0)
+            for row in range(len(samples[names[0]]) if names else 0):
+                writer.writerow([first + row] + [
+                    round(samples[name][row] * 1000, 4) if name in self.timings else samples[name][row]
+                    for name in names])
+
+
+class ProfilerOverlay:
+    """On-screen readout of a FrameProfiler, refreshed a few times a second"""
+    REFRESH_FRAMES = 15
+
+    def __init__(self, profiler: FrameProfiler, color=(0, 255, 0)):
+        self.profiler = profiler
+        self.color = color
+        self.font: Optional[pygame.font.Font] = None
+        self._lines: List[pygame.Surface] = []
+        self._rendered_at = -1
+
+    def _render_lines(self) -> None:
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 14)
+        summary = self.profiler.summary()
+        text = []
+        for name, stats in summary.items():
+            if 'p50' in stats:
+                text.append(f"{name:<16} p50 {stats['p50']:6.2f} ms  p99 {stats['p99']:6.2f} ms")
+            else:
+                text.append(f"{name:<16} {stats['last']:.0f}")
+        self._lines = [self.font.render(line, True, self.color) for line in text]
+        self._rendered_at = self.profiler.frames
+
+    def draw(self, screen: pygame.Surface) -> Optional[pygame.Rect]:
+        """Draw the readout in the top-left corner, returning the rect painted"""
+        if self.profiler.frames - self._rendered_at >= self.REFRESH_FRAMES or self._rendered_at < 0:
+            self._render_lines()
+        if not self._lines:
+            return None
+        painted = None
+        y = 4
+        for line in self._lines:
+            rect = screen.blit(line, (4, y))
+            painted = rect if painted is None else painted.union(rect)
+            y += line.get_height()
+        return painted
+
+
+frame_profiler = FrameProfiler()
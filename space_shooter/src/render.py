@@ -0,0 +1,64 @@
+import pygame
+from typing import List, Optional, Tuple
+
+
+class DirtyRectRenderer:
+    """Presents frames by updating only the screen areas that changed
+
+    Drawables report the rect they painted each frame. At the start of the
+    next frame those rects are erased back to the background, and both the
+    erased and the newly painted rects are pushed to the display with
+    ``pygame.display.update(rects)``. When the changed area covers more than
+    ``full_flip_threshold`` of the screen, a full clear and flip is cheaper,
+    so the renderer falls back to that.
+    """
+    def __init__(self, screen: pygame.Surface, background: Tuple[int, int, int],
+                 full_flip_threshold: float = 0.5):
+        self.screen = screen
+        self.background = background
+        self.full_flip_threshold = full_flip_threshold
+        self.bounds = screen.get_rect()
+        self._erased: List[pygame.Rect] = []
+        self._painted: List[pygame.Rect] = []
+        self._needs_full_frame = True
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def invalidate(self) -> None:
+        """Force the next frame to repaint and flip the whole screen"""
+        self._needs_full_frame = True
+
+    def begin_frame(self) -> None:
+        """Erase whatever was painted last frame"""
+        if self._needs_full_frame:
+            self.screen.fill(self.background)
+            self._erased = []
+        else:
+            for rect in self._painted:
+                self.screen.fill(self.background, rect)
+            self._erased = self._painted
+        self._painted = []
+
+    def add(self, rect: Optional[pygame.Rect]) -> None:
+        """Record a rect painted during this frame"""
+        if rect is None:
+            return
+        rect = rect.clip(self.bounds)
+        if rect.width and rect.height:
+            self._painted.append(rect)
+
+    def coverage(self) -> float:
+        """Fraction of the screen touched this frame (overlaps counted twice)"""
+        area = sum(rect.width * rect.height for rect in self._erased)
+        area += sum(rect.width * rect.height for rect in self._painted)
+        return area / (self.bounds.width * self.bounds.height)
+
+    def present(self) -> None:
+        """Push the changed areas, or the whole frame, to the display"""
+        if self._needs_full_frame or self.coverage() > self.full_flip_threshold:
+            pygame.display.flip()
+            self._needs_full_frame = False
+            self.full_frames += 1
+        else:
+            pygame.display.update(self._erased + self._painted)
+            self.partial_frames += 1
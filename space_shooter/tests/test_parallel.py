@@ -0,0 +1,71 @@
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+import pytest
+
+import game
+from game import Controls, Game, ScriptedInput
+from parallel import SimulationPool, integrate_particles
+
+
+@pytest.fixture
+def pool():
+    pool = SimulationPool(2, min_shard=1)
+    yield pool
+    pool.close()
+
+
+def count_sharded_steps(pool, monkeypatch):
+    """Count the steps that really went to the worker processes"""
+    calls = []
+    starmap = pool._pool.starmap
+
+    def counting_starmap(fn, tasks):
+        calls.append(len(tasks))
+        return starmap(fn, tasks)
+
+    monkeypatch.setattr(pool._pool, "starmap", counting_starmap)
+    return calls
+
+
+def test_sharded_step_matches_single_process(pool, monkeypatch):
+    calls = count_sharded_steps(pool, monkeypatch)
+    rng = np.random.default_rng(1)
+    block = pool.allocate((5, 1000))
+    block.array[:] = rng.uniform(-100, 100, block.shape)
+    expected = block.array.copy()
+
+    for _ in range(10):
+        pool.step([("particles", block, 777, 1 / 60, ())])
+        integrate_particles(expected[:, :777], 1 / 60)
+
+    assert calls == [2] * 10
+    assert np.array_equal(block.array, expected)
+
+
+def run_game(workers, seed=7):
+    g = Game(headless=True, workers=workers, input_source=ScriptedInput(Controls(thrust=True, left=True)))
+    g.player.thruster_particles.rng = np.random.default_rng(seed)
+    return g
+
+
+def test_game_workers_shard_particles_with_identical_results(monkeypatch):
+    single = run_game(0)
+    sharded = run_game(2)
+    try:
+        calls = count_sharded_steps(sharded.sim_pool, monkeypatch)
+        single.simulate(120)
+        sharded.simulate(120)
+
+        a, b = single.player.thruster_particles, sharded.player.thruster_particles
+        assert a.count == b.count > 2 * game.PARTICLE_MIN_SHARD
+        assert calls, "the game never used its worker processes"
+        assert np.array_equal(a._data[:, :a.count], b._data[:, :b.count])
+    finally:
+        single.close()
+        sharded.close()